@@ -1,8 +1,6 @@
-import pytesseract
+from helper.ocr_cache import ocr_cache
 import configparser
 import re
-import cv2
-from qreader import QReader
 from config.indian_places import indian_states_cities
 from ocrr_log_mgmt.ocrr_log import OCRREngineLogging
 from helper.eaadhaarcard_text_coordinates import TextCoordinates
@@ -21,6 +19,9 @@ class AaadhaarCardInfo:
         log_config = OCRREngineLogging()
         self.logger = log_config.configure_logger()
 
+        """Run the independent OCR passes of this document concurrently"""
+        ocr_cache.prefetch(document_path, [("eng", ""), ("hin+eng", r'--oem 3 --psm 11')])
+
         """Get coordinates"""
         self.coordinates_default = TextCoordinates(document_path, lang_type="default").generate_text_coordinates()
         self.coordinates_regional = TextCoordinates(document_path, lang_type="regional").generate_text_coordinates()
@@ -29,14 +30,11 @@ class AaadhaarCardInfo:
         
         """Get String"""
         tesseract_config = r'--oem 3 --psm 11'
-        self.text_data_default = pytesseract.image_to_string(document_path)
-        self.text_data_regional = pytesseract.image_to_string(document_path, lang="hin+eng", config=tesseract_config)
+        self.text_data_default = ocr_cache.image_to_string(document_path)
+        self.text_data_regional = ocr_cache.image_to_string(document_path, lang="hin+eng", config=tesseract_config)
 
         self.states = indian_states_cities
 
-        # Create a QReader instance
-        self.qreader = QReader()
-
     """func: extract DOB"""
     def extract_dob(self):
         result = {
@@ -50,12 +48,20 @@ class AaadhaarCardInfo:
             """Data patterns: DD/MM/YYY, DD-MM-YYY"""
             date_pattern = r'\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4}|\d{4}'
 
-            for i, (x1, y1, x2, y2, text) in enumerate(self.coordinates_default):
-                match = re.search(date_pattern, text)
-                if match:
+            """A confidently read full date is taken as is, without scanning for looser matches"""
+            for x1, y1, x2, y2, text in self.coordinates_default.confident():
+                if re.fullmatch(r'\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4}', text):
                     dob_coordinates = [x1, y1, x2, y2]
                     dob_text = text
                     break
+
+            if not dob_coordinates:
+                for i, (x1, y1, x2, y2, text) in enumerate(self.coordinates_default):
+                    match = re.search(date_pattern, text)
+                    if match:
+                        dob_coordinates = [x1, y1, x2, y2]
+                        dob_text = text
+                        break
         
             if not dob_coordinates:
                 return result
@@ -130,10 +136,12 @@ class AaadhaarCardInfo:
                 if len(text_coordinates) == 3:
                     break
         
+            """Every token containing the first two groups, looked up in the token index"""
+            token_grid = self.coordinates_default.grid()
             for i in text_coordinates[:-1]:
-                for k,(x1,y1,x2,y2,text) in enumerate(self.coordinates_default):
-                    if i in text:
-                        aadhaarcard_coordinates.append([x1, y1, x2, y2])
+                for k in token_grid.containing(i):
+                    x1, y1, x2, y2, text = self.coordinates_default[k]
+                    aadhaarcard_coordinates.append([x1, y1, x2, y2])
 
             result = {
                 "Aadhaar Number": aadhaarcard_text,
@@ -319,11 +327,8 @@ class AaadhaarCardInfo:
         try:
             qrcode_coordinates = []
 
-            # Load the image
-            image = cv2.imread(self.document_path)
-
-            # Detect and decode QR codes
-            found_qrs = self.qreader.detect(image)
+            # Detect QR codes, cached by image content
+            found_qrs = ocr_cache.detect_qr_codes(self.document_path)
 
             if not found_qrs:
                 return result
@@ -1,9 +1,7 @@
-import pytesseract
+from helper.ocr_cache import ocr_cache
 import configparser
 import re
-import cv2
 import datetime
-from qreader import QReader
 from config.indian_places import indian_states_cities
 from ocrr_log_mgmt.ocrr_log import OCRREngineLogging
 from helper.eaadhaarcard_text_coordinates import TextCoordinates
@@ -22,19 +20,20 @@ class EaadhaarCardInfo:
         log_config = OCRREngineLogging()
         self.logger = log_config.configure_logger()
 
+        """Run the independent OCR passes of this document concurrently"""
+        ocr_cache.prefetch(document_path, [("eng", ""), ("hin+eng", r'--oem 3 --psm 11'), ("eng", r'--oem 3 --psm 11'), ("hin+eng", "")])
+
         self.coordinates_default = TextCoordinates(document_path, lang_type="default").generate_text_coordinates()
         self.coordinates_regional = TextCoordinates(document_path, lang_type="regional").generate_text_coordinates()
         self.coordinates = TextCoordinates(document_path).generate_text_coordinates()
         
         print(self.coordinates)
 
-        self.text_data_default = pytesseract.image_to_string(document_path)
-        self.text_data_regional = pytesseract.image_to_string(document_path, lang="hin+eng")
+        self.text_data_default = ocr_cache.image_to_string(document_path)
+        self.text_data_regional = ocr_cache.image_to_string(document_path, lang="hin+eng")
 
         self.states = indian_states_cities
         
-        # Create a QReader instance
-        self.qreader = QReader()
     
     """func: extract dob"""
     def extract_dob(self) -> dict:
@@ -49,13 +48,24 @@ class EaadhaarCardInfo:
             """Data patterns: DD/MM/YYY, DD-MM-YYY"""
             date_pattern = r'\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4}|\d{4}'
 
-            for i, (x1, y1, x2, y2, text) in enumerate(self.coordinates_default):
-                match = re.search(date_pattern, text)
-                if match:
+            """A confidently read valid date in either pass is taken as is, without the scans below"""
+            for coordinates in (self.coordinates_default, self.coordinates):
+                for x1, y1, x2, y2, text in coordinates.confident():
                     if self.validate_date(text, '/'):
                         dob_coordinates = [x1, y1, x2, y2]
                         dob_text += " "+text
                         break
+                if dob_coordinates:
+                    break
+
+            if not dob_coordinates:
+                for i, (x1, y1, x2, y2, text) in enumerate(self.coordinates_default):
+                    match = re.search(date_pattern, text)
+                    if match:
+                        if self.validate_date(text, '/'):
+                            dob_coordinates = [x1, y1, x2, y2]
+                            dob_text += " "+text
+                            break
 
             if not dob_coordinates:
                 """check with other coordinate data"""
@@ -115,8 +125,8 @@ class EaadhaarCardInfo:
             if matching_index == 0:
                 return result
         
-            """reverse loop from Male/Female index until DOB comes"""
-            for i in range(matching_index, -1, -1):
+            """Male/Female and the words left of it on its line, until DOB comes"""
+            for i in [matching_index] + self.coordinates_default.grid().left_of(matching_index):
                 if re.match(r'^\d{2}/\d{2}/\d{4}$', self.coordinates_default[i][4]) or re.match(r'^\d{4}$', self.coordinates_default[i][4]):
                     break
                 else:
@@ -160,10 +170,12 @@ class EaadhaarCardInfo:
                 if len(text_coordinates) == 3:
                     break
         
+            """Every token containing the first two groups, looked up in the token index"""
+            token_grid = self.coordinates.grid()
             for i in text_coordinates[:-1]:
-                for k,(x1,y1,x2,y2,text) in enumerate(self.coordinates):
-                    if i in text:
-                        aadhaarcard_coordinates.append([x1, y1, x2, y2])
+                for k in token_grid.containing(i):
+                    x1, y1, x2, y2, text = self.coordinates[k]
+                    aadhaarcard_coordinates.append([x1, y1, x2, y2])
             result = {
                 "E-Aadhaar Number": aadhaarcard_text,
                 "coordinates": aadhaarcard_coordinates
@@ -377,11 +389,8 @@ class EaadhaarCardInfo:
             }
         try:
             qrcode_coordinates = []
-            # Load the image
-            image = cv2.imread(self.document_path)
-
-            # Detect and decode QR codes
-            found_qrs = self.qreader.detect(image)
+            # Detect QR codes, cached by image content
+            found_qrs = ocr_cache.detect_qr_codes(self.document_path)
 
             if not found_qrs:
                return result
@@ -0,0 +1,89 @@
+"""
+    Classification benchmark: accuracy, tesseract calls and latency of the header-band fast pass vs the full-page pass
+    Each document is classified and then extracted as in the engine, so a header pass that only adds a tesseract run
+    (the extractor reads the full page anyway) shows up in the calls per document
+    The labelled corpus is one folder per expected type, named as in DocumentTypeIdentification.DOCUMENT_TYPES,
+    plus "Unidentified" for documents no type should match:
+        corpus/PAN/*.jpg, corpus/E-Aadhaar/*.jpg, corpus/Unidentified/*.jpg, ...
+    Run from the repository root:
+        python -m benchmarks.classification_benchmark corpus
+"""
+import os
+import argparse
+import statistics
+from time import perf_counter
+from document_type_identification.identify_documents import DocumentTypeIdentification
+from perform_ocrr.perform_ocrr_docs import PerformOCRROnDocument
+from helper.ocr_cache import ocr_cache
+from helper.document_context import document_contexts
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff")
+
+class NoCheckpoint:
+    """A task that starts from scratch, nothing cached by a previous run"""
+    def done(self, stage: str) -> bool:
+        return False
+
+def load_corpus(corpus_path: str) -> list:
+    corpus = []
+    for label in sorted(os.listdir(corpus_path)):
+        label_path = os.path.join(corpus_path, label)
+        if not os.path.isdir(label_path):
+            continue
+        for document_name in sorted(os.listdir(label_path)):
+            if document_name.lower().endswith(IMAGE_EXTENSIONS):
+                corpus.append((os.path.join(label_path, document_name), label))
+    return corpus
+
+def classify_and_extract(document_path: str, fast_pass: bool) -> tuple:
+    """Same as PerformOCRROnDocument.classify and extract, without the database"""
+    document_identification_obj = DocumentTypeIdentification(document_path, fast_pass=fast_pass)
+    document_type = document_identification_obj.document_type()
+    ocrr = PerformOCRROnDocument({"documentPath": document_path}, NoCheckpoint(), db_client=False)
+    ocrr.extract(document_type)
+    return document_type or "Unidentified", document_identification_obj.classification_pass
+
+def run(name: str, corpus: list, fast_pass: bool) -> dict:
+    correct = 0
+    escalated = 0
+    latencies = []
+    calls_by_label = {}
+    for document_path, label in corpus:
+        start = perf_counter()
+        document_type, classification_pass = classify_and_extract(document_path, fast_pass)
+        latencies.append(perf_counter() - start)
+        """Every document starts cold, as in the engine"""
+        ocr_stats = ocr_cache.finish_document()
+        document_contexts.release(document_path)
+        calls_by_label.setdefault(label, []).append(ocr_stats['tesseractCalls'])
+        correct += document_type == label
+        escalated += fast_pass and classification_pass == "full page"
+
+    latencies.sort()
+    p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+    tesseract_calls = [calls for label_calls in calls_by_label.values() for calls in label_calls]
+    print(f"{name:<10} accuracy={correct / len(corpus):.1%} ({correct}/{len(corpus)}) "
+          f"tesseract_calls/doc={statistics.mean(tesseract_calls):.2f} "
+          f"mean={1000 * statistics.mean(latencies):.0f}ms p95={1000 * p95:.0f}ms "
+          f"escalated={escalated}")
+    return {label: statistics.mean(label_calls) for label, label_calls in calls_by_label.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="folder with one sub-folder of images per document type")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        parser.error(f"no labelled images found in {args.corpus}")
+
+    full_page_calls = run("full page", corpus, fast_pass=False)
+    fast_pass_calls = run("fast pass", corpus, fast_pass=True)
+
+    """Where the header pass pays off: negative is a saving"""
+    for label in full_page_calls:
+        print(f"{label:<16} tesseract_calls/doc full page={full_page_calls[label]:.2f} fast pass={fast_pass_calls[label]:.2f} "
+              f"difference={fast_pass_calls[label] - full_page_calls[label]:+.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+    Intake benchmark: MongoDB round trips and intake latency for N pending IN_PROGRESS tasks
+    Compares the per-document intake (find_one + insert_one + update_one per task) with the batched sweep
+    Uses a scratch database on the local MongoDB, run from the repository root:
+        python -m benchmarks.intake_benchmark --tasks 10000
+"""
+import argparse
+import threading
+from time import perf_counter
+from pymongo import MongoClient, monitoring
+from in_progress.filter_in_progress import FilterInProgressDocuments
+from task_scheduler.client_fair_queue import ClientFairQueue
+from task_lease.task_lease import TaskLease
+
+class RoundTripCounter(monitoring.CommandListener):
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def started(self, event):
+        with self.lock:
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def seed_pending_tasks(collection_filedetails, tasks: int, clients: int):
+    collection_filedetails.drop()
+    collection_filedetails.insert_many([
+        {
+            "taskId": f"bench-{i}",
+            "status": "IN_PROGRESS",
+            "clientId": f"client-{i % clients}",
+            "uploadDir": f"/bench/client-{i % clients}/bench-{i}.jpg",
+            "taskResult": ""
+        }
+        for i in range(tasks)
+    ])
+    collection_filedetails.create_index([("status", 1), ("clientId", 1), ("priority", 1), ("_id", 1)])
+
+def reset_workspace(collection_ocrr):
+    collection_ocrr.drop()
+    TaskLease(collection_ocrr).ensure_indexes()
+
+def per_document_intake(intake: FilterInProgressDocuments):
+    """The intake before batching: one query per task to check it, one insert and one update per task"""
+    for document in intake.collection_filedetails.find({"status": "IN_PROGRESS"}):
+        if intake.collection_ocrr.find_one({"taskId": document['taskId']}):
+            continue
+        document_info = intake.build_document_info(document)
+        intake.collection_ocrr.insert_one(dict(document_info))
+        intake.in_progress_queue.put(document_info)
+        intake.collection_filedetails.update_one({"taskId": document['taskId']}, {"$set": {"status": "IN_QUEUE"}})
+
+def batched_intake(intake: FilterInProgressDocuments):
+    intake.sweep_in_progress_documents()
+
+def run(name: str, intake_fn, intake: FilterInProgressDocuments, counter: RoundTripCounter, tasks: int, clients: int):
+    seed_pending_tasks(intake.collection_filedetails, tasks, clients)
+    reset_workspace(intake.collection_ocrr)
+    intake.in_progress_queue = ClientFairQueue(tasks)
+
+    counter.count = 0
+    start = perf_counter()
+    intake_fn(intake)
+    elapsed = perf_counter() - start
+
+    admitted = intake.in_progress_queue.qsize()
+    print(f"{name:<14} admitted={admitted:<7} round_trips={counter.count:<7} "
+          f"latency={elapsed:.2f}s per_task={1000 * elapsed / max(admitted, 1):.3f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="ocrr_intake_benchmark")
+    args = parser.parse_args()
+
+    counter = RoundTripCounter()
+    client = MongoClient(args.uri, event_listeners=[counter])
+    database = client[args.database]
+
+    """Point the intake at the scratch database"""
+    intake = FilterInProgressDocuments("C:\\bench", ClientFairQueue(args.tasks))
+    intake.collection_filedetails = database["fileDetails"]
+    intake.collection_ocrr = database["ocrr"]
+    intake.task_lease = TaskLease(intake.collection_ocrr)
+
+    try:
+        run("per-document", per_document_intake, intake, counter, args.tasks, args.clients)
+        run("batched", batched_intake, intake, counter, args.tasks, args.clients)
+    finally:
+        client.drop_database(args.database)
+        client.close()
+
+if __name__ == '__main__':
+    main()
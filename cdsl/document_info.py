@@ -1,4 +1,4 @@
-import pytesseract
+from helper.ocr_cache import ocr_cache
 import re
 import configparser
 from ocrr_log_mgmt.ocrr_log import OCRREngineLogging
@@ -20,7 +20,7 @@ class CDSLInfo:
         self.coordinates_default = TextCoordinates(document_path, lang_type="default").generate_text_coordinates()
 
         """Get the text from document"""
-        self.text_data = pytesseract.image_to_string(document_path)
+        self.text_data = ocr_cache.image_to_string(document_path)
 
     """func: extract PANCARD number"""
     def extract_pancard_number(self):
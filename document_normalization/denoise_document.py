@@ -0,0 +1,40 @@
+import cv2
+import numpy as np
+
+class DocumentDenoise:
+    """
+        Denoise only as much as the document needs before OCR
+        The noise level is estimated on the grayscale image (Immerkaer's noise kernel, with the median absolute response
+        so text edges do not count as noise) and picks one of the tiers
+        - none: clean digital documents (e-Aadhaar, e-PAN, good scans)
+        - light: 3x3 median blur, for mildly noisy scans
+        - heavy: non-local means, for noisy photos
+    """
+    TIERS = ("none", "light", "heavy")
+    NOISE_KERNEL = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+
+    def __init__(self, light_noise_sigma: float, heavy_noise_sigma: float) -> None:
+        self.light_noise_sigma = light_noise_sigma
+        self.heavy_noise_sigma = heavy_noise_sigma
+
+    def noise_sigma(self, gray_document) -> float:
+        """Standard deviation of the pixel noise, in gray levels"""
+        response = cv2.filter2D(gray_document, cv2.CV_32F, self.NOISE_KERNEL)[1:-1:2, 1:-1:2]
+        if response.size == 0:
+            return 0.0
+        """The kernel response of gaussian noise has a standard deviation of 6 sigma, MAD to sigma is 1.4826"""
+        return 1.4826 * float(np.median(np.abs(response))) / 6
+
+    def tier(self, noise_sigma: float) -> str:
+        if noise_sigma >= self.heavy_noise_sigma:
+            return "heavy"
+        if noise_sigma >= self.light_noise_sigma:
+            return "light"
+        return "none"
+
+    def denoise(self, document, tier: str):
+        if tier == "heavy":
+            return cv2.fastNlMeansDenoisingColored(document, None, 10, 10, 7, 21)
+        if tier == "light":
+            return cv2.medianBlur(document, 3)
+        return document
@@ -0,0 +1,56 @@
+import cv2
+from helper.document_context import document_contexts
+
+class DocumentNormalization:
+    """
+        Resize the workspace copy so its long side is between min_long_side and max_long_side before OCR
+        Large scans are shrunk (tesseract time grows with pixel count), small photos are enlarged (small text OCRs poorly)
+        Returns the scale applied, coordinates are mapped back with ScaleTransform
+    """
+    def __init__(self, document_path: str, min_long_side: int, max_long_side: int) -> None:
+        self.document_path = document_path
+        self.min_long_side = min_long_side
+        self.max_long_side = max_long_side
+
+    def normalize(self) -> float:
+        document_context = document_contexts.context(self.document_path)
+        document = document_context.bgr()
+        if document is None:
+            return 1.0
+        height, width = document.shape[:2]
+        long_side = max(height, width)
+        if long_side > self.max_long_side:
+            scale = self.max_long_side / long_side
+            interpolation = cv2.INTER_AREA
+        elif long_side < self.min_long_side:
+            scale = self.min_long_side / long_side
+            interpolation = cv2.INTER_CUBIC
+        else:
+            return 1.0
+
+        normalized_document = cv2.resize(document, (max(round(width * scale), 1), max(round(height * scale), 1)),
+                                         interpolation=interpolation)
+        cv2.imwrite(self.document_path, normalized_document, [cv2.IMWRITE_JPEG_QUALITY, 95])
+        """The later stages use the resized image, the rewritten file is not decoded again"""
+        document_context.replace(normalized_document)
+        return scale
+
+class ScaleTransform:
+    """Map coordinates found on the normalized image back to the uploaded image"""
+    def __init__(self, scale: float = 1.0) -> None:
+        self.scale = scale or 1.0
+
+    def to_original(self, coordinates: list) -> list:
+        if self.scale == 1.0:
+            return coordinates
+        return [int(round(value / self.scale)) for value in coordinates]
+
+    def coordinates_to_original(self, coordinates_list: list) -> list:
+        return [self.to_original(coordinates) if len(coordinates) == 4 else coordinates for coordinates in coordinates_list]
+
+    def result_to_original(self, result_data: list) -> list:
+        """Extractor results: a list of {<title>: <value>, "coordinates": [[x1, y1, x2, y2], ...]}"""
+        return [
+            {**document_info, "coordinates": self.coordinates_to_original(document_info.get('coordinates', []))}
+            for document_info in result_data
+        ]
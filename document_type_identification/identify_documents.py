@@ -1,4 +1,5 @@
-import pytesseract
+import cv2
+import configparser
 from pancard.identify_pancard import IdentifyPanCard
 from aadhaarcard.identify_aadhaarcard import IdentifyAadhaarCard
 from passport.identify_passport import IdentifyPassport
@@ -7,38 +8,128 @@ from cdsl.identify_cdsl import IdentifyCDSL
 from e_pancard.identify_e_pancard import IdentifyEPanCard
 from check_img_rgb.image_rgb import CheckImageRGB
 from helper.clean_text import CleanText
+from document_type_identification.document_type_matcher import DocumentTypeMatcher
+from helper.ocr_cache import ocr_cache
+from helper.document_context import document_contexts
 
 class DocumentTypeIdentification:
-    def __init__(self, document_path: str) -> None:
+    """Document types in identification precedence"""
+    DOCUMENT_TYPES = ("CDSL", "E-PAN", "PAN", "E-Aadhaar", "Aadhaar", "Bharat Passport", "Bharat DL")
+    """
+        Page segmentation modes of the English full-page OCR each type's extractor runs
+        The full-page classification pass is the same tesseract run as one of these when its mode is listed, the OCR cache shares it
+    """
+    EXTRACTION_PSMS = {
+        "CDSL": (3,),
+        "E-PAN": (3, 11),
+        "PAN": (11,),
+        "E-Aadhaar": (3, 11),
+        "Aadhaar": (3,),
+        "Bharat Passport": (11,),
+        "Bharat DL": (3,)
+    }
+    matcher = None
+
+    def __init__(self, document_path: str, fast_pass: bool = None) -> None:
 
         self.document_path = document_path
-    
+
+        """Read config.ini"""
+        config = configparser.ConfigParser(allow_no_value=True)
+        config.read(r'C:\Program Files (x86)\OCRR\config\config.ini')
+        self.fast_pass = config.getboolean('Classification', 'FastPass', fallback=False) if fast_pass is None else fast_pass
+        self.max_width = config.getint('Classification', 'MaxWidth', fallback=1000)
+        self.header_band = config.getfloat('Classification', 'HeaderBand', fallback=0.4)
+        """PAN and Aadhaar are escalated by default: the e-PAN / e-Aadhaar keywords may be below the header band"""
+        decisive_types = config.get('Classification', 'DecisiveTypes', fallback="CDSL, E-PAN, E-Aadhaar, Bharat Passport, Bharat DL")
+        self.decisive_types = [document_type.strip() for document_type in decisive_types.split(',') if document_type.strip()]
+
+        """
+            The header pass only saves a tesseract run for a type whose extractor does not read the page with the
+            full-page classification mode anyway; it is run only when such a type is in DecisiveTypes
+        """
+        full_page_psm = self.full_page_psm()
+        self.header_types = [document_type for document_type in self.decisive_types
+                             if full_page_psm not in self.EXTRACTION_PSMS.get(document_type, ())]
+
+        """Fast pass on the header band, full page only when the header is not conclusive"""
+        self.classification_pass = "header"
+        self.document_type_hits = None
+        header_pass = self.fast_pass and bool(self.header_types)
+        if header_pass:
+            self.document_type_hits = self.identify_text(self.get_header_text_from_image())
+        if not header_pass or not self.header_is_conclusive():
+            self.classification_pass = "full page"
+            self.document_type_hits = self.identify_text(self.get_text_from_image())
+
+    @classmethod
+    def document_type_matcher(cls) -> DocumentTypeMatcher:
+        """The identifier patterns of every document type, compiled once per process"""
+        if cls.matcher is None:
+            aadhaarcard_identifiers = IdentifyAadhaarCard([])
+            cls.matcher = DocumentTypeMatcher({
+                "CDSL": IdentifyCDSL([]).cdsl_regex,
+                "E-PAN": IdentifyEPanCard([]).pancard_regex,
+                "PAN": IdentifyPanCard([]).pancard_regex,
+                "Aadhaar Format": aadhaarcard_identifiers.aadhaarcard_regex,
+                "E-Aadhaar": aadhaarcard_identifiers.eaadhaarcard_regex,
+                "Aadhaar": aadhaarcard_identifiers.aadhaar_card_regex,
+                "Bharat Passport": IdentifyPassport([]).passport_regex,
+                "Bharat DL": IdentifyDrivingLicense([]).dl_regex
+            })
+        return cls.matcher
+
+    def identify_text(self, data_text: dict) -> dict:
         """Clean the extracted text"""
-        data_text = self.get_text_from_image()
         clean_text_data = CleanText(data_text).clean_text()
-        
-        """Initialize doocument objects"""
-        self.document_identification_objects = {
-            "CDSL": IdentifyCDSL(clean_text_data).check_cdsl(),
-            "E-PAN": IdentifyEPanCard(clean_text_data).check_e_pan_card(),
-            "PAN": IdentifyPanCard(clean_text_data).check_pan_card(),
-            "Aadhaar Format": IdentifyAadhaarCard(clean_text_data).check_aadhaar_card_format(),
-            "E-Aadhaar": IdentifyAadhaarCard(clean_text_data).check_e_aadhaar_card(),
-            "Aadhaar": IdentifyAadhaarCard(clean_text_data).check_aadhaarcard(),
-            "Bharat Passport": IdentifyPassport(clean_text_data).check_passport(),
-            "Bharat DL": IdentifyDrivingLicense(clean_text_data).check_dl()
-        }
-    
-    def get_text_from_image(self) -> str:
-        if CheckImageRGB(self.document_path).check_rgb_image():
+
+        """One scan over the text, every hit recorded with its document type"""
+        return self.document_type_matcher().find_hits(clean_text_data)
+
+    def header_is_conclusive(self) -> bool:
+        """Exactly one document type matched, the header alone is enough to tell that type and it saves a full-page run"""
+        matched_types = self.matched_types()
+        return len(matched_types) == 1 and matched_types[0] in self.header_types
+
+    def matched_types(self) -> list:
+        return [document_type for document_type in self.DOCUMENT_TYPES if document_type in self.document_type_hits]
+
+    def get_header_text_from_image(self) -> dict:
+        """Half-size (at most max_width wide) grayscale top band, where the identifying keywords are"""
+        document_context = document_contexts.context(self.document_path)
+        if document_context.bgr() is None:
+            return {"text": ""}
+        header = document_context.view(f"header:{self.max_width}:{self.header_band}", lambda image: self.header_band_image(document_context.gray()))
+
+        tesseract_config = r'-l eng --oem 3 --psm 11'
+        return {"text": ocr_cache.image_to_string(self.document_path, config=tesseract_config,
+                                                  region=(f"header:{self.max_width}:{self.header_band}", header))}
+
+    def header_band_image(self, gray_document):
+        height, width = gray_document.shape[:2]
+        reduced_width = max(min(width // 2, self.max_width), 1)
+        reduced_height = max(int(height * reduced_width / width), 1)
+        document = cv2.resize(gray_document, (reduced_width, reduced_height), interpolation=cv2.INTER_AREA)
+        return document[:max(int(reduced_height * self.header_band), 1), :]
+
+    def full_page_psm(self) -> int:
+        """Grayscale pages are read with tesseract's default page segmentation, colour pages as sparse text"""
+        return 3 if CheckImageRGB(self.document_path).check_rgb_image() else 11
+
+    def get_text_from_image(self) -> dict:
+        if self.full_page_psm() == 3:
             tesseract_config = r'-l eng --oem 3'
         else:
             tesseract_config = r'-l eng --oem 3 --psm 11'
-        
-        return pytesseract.image_to_string(self.document_path, output_type=pytesseract.Output.DICT, config=tesseract_config)
+
+        return {"text": ocr_cache.image_to_string(self.document_path, config=tesseract_config)}
 
     def identify_document(self, document_type: str) -> bool:
-        if document_type in self.document_identification_objects:
-            return self.document_identification_objects[document_type]
-        else:
-            return False
\ No newline at end of file
+        return document_type in self.document_type_hits
+
+    def document_type(self) -> str:
+        """First matched type in precedence order, None for an un-identified document"""
+        for document_type in self.DOCUMENT_TYPES:
+            if document_type in self.document_type_hits:
+                return document_type
+        return None
@@ -1,4 +1,4 @@
-import pytesseract
+from helper.ocr_cache import ocr_cache
 import configparser
 import re
 from config.indian_places import indian_states_cities
@@ -21,7 +21,7 @@ class DrivingLicenseDocumentInfo:
         self.coordinates = TextCoordinates(document_path).generate_text_coordinates()
 
         """Get the text from document"""
-        self.text_data = pytesseract.image_to_string(document_path, lang="eng")
+        self.text_data = ocr_cache.image_to_string(document_path, lang="eng")
 
         """List of states"""
         self.states = indian_states_cities
@@ -1,10 +1,8 @@
 import re
-import pytesseract
+from helper.ocr_cache import ocr_cache
+from helper.document_context import document_contexts
 import datetime
-import cv2
 import configparser
-from PIL import Image
-from qreader import QReader
 from ocrr_log_mgmt.ocrr_log import OCRREngineLogging
 from helper.pancard_text_coordinates import TextCoordinates
 from helper.e_pancard_signature_text_coords import EPancardSignatureTextCoordinates
@@ -23,6 +21,9 @@ class EPancardDocumentInfo:
         log_config = OCRREngineLogging()
         self.logger = log_config.configure_logger()
 
+        """Run the independent OCR passes of this document concurrently"""
+        ocr_cache.prefetch(document_path, [("eng", r'--oem 3 --psm 11'), ("hin+eng", ""), ("eng", "")])
+
         """Get the coordinates of all the extracted text"""
         self.coordinates = TextCoordinates(document_path).generate_text_coordinates()
 
@@ -31,13 +32,10 @@ class EPancardDocumentInfo:
 
         """Get the text from document"""
         tesseract_config = r'--oem 3 --psm 11'
-        self.text_data = pytesseract.image_to_string(document_path, lang="eng", config=tesseract_config)
+        self.text_data = ocr_cache.image_to_string(document_path, lang="eng", config=tesseract_config)
 
         """Get the text for signature identification"""
-        self.signature_text_data = pytesseract.image_to_string(document_path)
-
-        """Create a QReader instance"""
-        self.qreader = QReader()
+        self.signature_text_data = ocr_cache.image_to_string(document_path)
     
     """func: extract PAN Card number"""
     def extract_pancard_number(self) -> dict:
@@ -82,12 +80,20 @@ class EPancardDocumentInfo:
             """Data patterns: DD/MM/YYY, DD-MM-YYY"""
             date_pattern = r'\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4}'
 
-            for i, (x1, y1, x2, y2, text) in enumerate(self.coordinates):
-                match = re.search(date_pattern, text)
-                if match:
+            """A confidently read full date is taken as is, without scanning for looser matches"""
+            for x1, y1, x2, y2, text in self.coordinates.confident():
+                if re.fullmatch(date_pattern, text):
                     dob_coordinates = [x1, y1, x2, y2]
                     dob_text = text
                     break
+
+            if not dob_coordinates:
+                for i, (x1, y1, x2, y2, text) in enumerate(self.coordinates):
+                    match = re.search(date_pattern, text)
+                    if match:
+                        dob_coordinates = [x1, y1, x2, y2]
+                        dob_text = text
+                        break
             if not dob_coordinates:
                 return result
         
@@ -228,8 +234,7 @@ class EPancardDocumentInfo:
     def redact_bottom_pancard(self):
         result = {}
         bottom_coordinates = []
-        image = Image.open(self.document_path)
-        image_width, image_height = image.size
+        image_width, image_height = document_contexts.context(self.document_path).size()
         bottom_coordinates.append(self.bottom_40_percent_coordinates(image_width, image_height))
 
         result = {
@@ -253,11 +258,8 @@ class EPancardDocumentInfo:
             }
         try:
             qrcode_coordinates = []
-            # Load the image
-            image = cv2.imread(self.document_path)
-
-            # Detect and decode QR codes
-            found_qrs = self.qreader.detect(image)
+            # Detect QR codes, cached by image content
+            found_qrs = ocr_cache.detect_qr_codes(self.document_path)
 
             if not found_qrs:
                 return result
@@ -0,0 +1,137 @@
+import os
+import cv2
+import threading
+from PIL import Image
+from helper.image_header import ImageHeader
+from helper.grayscale_detector import GrayscaleDetector
+
+class DocumentContext:
+    """
+        The workspace image of one document, decoded once and shared by every stage and OCR call
+        Derived views (grayscale, PIL, downscaled crops) are computed once from the decoded image
+        The file is decoded again only when it changed on disk since the last decode
+    """
+    def __init__(self, document_path: str) -> None:
+        self.document_path = document_path
+        self.lock = threading.RLock()
+        self.file_key = None
+        self.image = None
+        self.shape = None
+        self.views = {}
+        self.header_key = None
+        self.header_size = None
+        self.decodes = 0
+        self.file_decodes = 0
+
+    def current_file_key(self) -> tuple:
+        try:
+            stat = os.stat(self.document_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def set_image(self, image, file_key: tuple):
+        self.image = image
+        self.shape = image.shape if image is not None else None
+        self.views = {}
+        self.file_key = file_key
+
+    def bgr(self):
+        """The decoded image (cv2 BGR array), None when the file can not be read"""
+        with self.lock:
+            file_key = self.current_file_key()
+            if self.image is None or file_key != self.file_key:
+                self.set_image(cv2.imread(self.document_path), file_key)
+                self.decodes += 1
+            return self.image
+
+    def replace(self, image):
+        """The file was rewritten with `image` (e.g. normalized), keep it without decoding the file again"""
+        with self.lock:
+            self.set_image(image, self.current_file_key())
+
+    def view(self, name: str, derive):
+        """View of the decoded image computed once by `derive(image)`"""
+        with self.lock:
+            image = self.bgr()
+            if name not in self.views:
+                self.views[name] = derive(image)
+            return self.views[name]
+
+    def gray(self):
+        return self.view("gray", lambda image: cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+
+    def is_grayscale(self) -> bool:
+        """Computed once per decoded image, shared by the preprocess grayscale check and classification"""
+        return self.view("isGrayscale", GrayscaleDetector().is_grayscale)
+
+    def pil(self) -> Image.Image:
+        """RGB PIL image, as the in-process tesseract engine takes it"""
+        return self.view("pil", lambda image: Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+
+    def size(self) -> tuple:
+        """
+            (width, height) of the decoded image, still known after the pixels were unloaded
+            Without a decoded image it is read from the file header, the image is decoded only for formats the header reader does not know
+        """
+        with self.lock:
+            file_key = self.current_file_key()
+            if self.shape is None or file_key != self.file_key:
+                if self.header_key != file_key:
+                    self.header_size = ImageHeader(self.document_path).size()
+                    self.header_key = file_key
+                if self.header_size is not None:
+                    return self.header_size
+                self.bgr()
+            height, width = self.shape[:2]
+            return width, height
+
+    def unload(self):
+        """Free the pixels once OCR is done, the size is kept for the redaction coordinates"""
+        with self.lock:
+            self.image = None
+            self.views = {}
+
+    def count_file_decode(self):
+        """The tesseract subprocess reads the file itself"""
+        with self.lock:
+            self.file_decodes += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"decodes": self.decodes, "fileDecodes": self.file_decodes}
+
+class DocumentContexts:
+    """Document contexts of the worker process, by workspace path"""
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.contexts = {}
+        self.total_decodes = 0
+        self.total_file_decodes = 0
+
+    def context(self, document_path: str) -> DocumentContext:
+        document_path = os.path.abspath(str(document_path))
+        with self.lock:
+            if document_path not in self.contexts:
+                self.contexts[document_path] = DocumentContext(document_path)
+            return self.contexts[document_path]
+
+    def release(self, document_path: str) -> dict:
+        """Drop the context of a finished document and return its decode counts"""
+        with self.lock:
+            context = self.contexts.pop(os.path.abspath(str(document_path)), None)
+        stats = context.stats() if context is not None else {"decodes": 0, "fileDecodes": 0}
+        with self.lock:
+            self.total_decodes += stats['decodes']
+            self.total_file_decodes += stats['fileDecodes']
+        return stats
+
+    def snapshot(self) -> dict:
+        """Decodes of the released documents since the previous snapshot"""
+        with self.lock:
+            snapshot = {"decodes": self.total_decodes, "fileDecodes": self.total_file_decodes}
+            self.total_decodes = 0
+            self.total_file_decodes = 0
+            return snapshot
+
+document_contexts = DocumentContexts()
@@ -1,5 +1,5 @@
-import pytesseract
-import re
+from helper.ocr_cache import ocr_cache
+from helper.ocr_tokens import OCRTokens
 
 class TextCoordinates:
     def __init__(self, image_path, lang_type=None) -> None:
@@ -7,21 +7,15 @@ class TextCoordinates:
         self.lang_type = lang_type
     
     # func: generate coordinates
-    def generate_text_coordinates(self) -> list:
+    def generate_text_coordinates(self) -> OCRTokens:
         if self.lang_type == "default":
-            data = pytesseract.image_to_data(self.image_path, output_type=pytesseract.Output.DICT, lang="eng")
+            data = ocr_cache.image_to_data(self.image_path, lang="eng")
         elif self.lang_type == "regional":
             tesseract_config = r'--oem 3 --psm 11'
-            data = pytesseract.image_to_data(self.image_path, output_type=pytesseract.Output.DICT, lang="hin+eng", config=tesseract_config)
+            data = ocr_cache.image_to_data(self.image_path, lang="hin+eng", config=tesseract_config)
         else:
             tesseract_config = r'--oem 3 --psm 11'
-            data = pytesseract.image_to_data(self.image_path, output_type=pytesseract.Output.DICT, lang="eng", config=tesseract_config)
+            data = ocr_cache.image_to_data(self.image_path, lang="eng", config=tesseract_config)
         
-        coordinates = []
-        for i in range(len(data['text'])):
-            text = data['text'][i]
-            x, y, w, h = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
-            # Filter out empty strings and  special characters
-            if text.strip() != '':
-                coordinates.append((x,y,x + w, y + h, text))
-        return coordinates
\ No newline at end of file
+        # Filter out empty strings, keep confidence and layout with every token
+        return OCRTokens.from_data(data)
\ No newline at end of file
@@ -0,0 +1,29 @@
+import numpy as np
+
+class GrayscaleDetector:
+    """
+        Whether a cv2 image holds only gray pixels (B == G == R everywhere)
+        A strided sample of the pixels is compared first, most colour documents differ there already
+        Only images that look gray on the sample are checked exactly, a block of rows at a time, stopping at the first colour block
+    """
+    def __init__(self, sample_pixels: int = 65536, block_rows: int = 256) -> None:
+        self.sample_pixels = sample_pixels
+        self.block_rows = block_rows
+
+    def is_grayscale(self, document) -> bool:
+        if len(document.shape) < 3 or document.shape[2] == 1:
+            return True
+
+        height, width = document.shape[:2]
+        step = max(int((height * width / self.sample_pixels) ** 0.5), 1)
+        if step > 1 and not self.gray_pixels(document[::step, ::step]):
+            return False
+
+        for row in range(0, height, self.block_rows):
+            if not self.gray_pixels(document[row:row + self.block_rows]):
+                return False
+        return True
+
+    def gray_pixels(self, block) -> bool:
+        blue, green, red = block[:, :, 0], block[:, :, 1], block[:, :, 2]
+        return np.array_equal(blue, green) and np.array_equal(blue, red)
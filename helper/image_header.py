@@ -0,0 +1,95 @@
+import struct
+
+class ImageHeader:
+    """
+        Width and height of a JPEG, PNG or TIFF image read from its header, without decoding the pixels
+        EXIF orientation 5-8 swaps width and height, as cv2.imread rotates such images on decode
+        size() is None for other formats or a header it can not parse, the caller then decodes the image
+    """
+    PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+    """Start-of-frame markers, every JPEG coding process except DHT/DAC/JPG extension markers"""
+    JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+    TIFF_WIDTH, TIFF_HEIGHT, TIFF_ORIENTATION = 256, 257, 274
+
+    def __init__(self, image_path: str) -> None:
+        self.image_path = image_path
+
+    def size(self) -> tuple:
+        """(width, height) or None"""
+        try:
+            with open(self.image_path, "rb") as image_file:
+                signature = image_file.read(8)
+                if signature.startswith(b"\xff\xd8"):
+                    return self.jpeg_size(image_file)
+                if signature == self.PNG_SIGNATURE:
+                    return self.png_size(image_file)
+                if signature[:4] in (b"II*\x00", b"MM\x00*"):
+                    return self.tiff_size(image_file)
+        except (OSError, struct.error, ValueError):
+            pass
+        return None
+
+    def png_size(self, image_file) -> tuple:
+        """The IHDR chunk comes first"""
+        length, chunk_type, width, height = struct.unpack(">I4sII", image_file.read(16))
+        if chunk_type != b"IHDR":
+            return None
+        return width, height
+
+    def jpeg_size(self, image_file) -> tuple:
+        """Walk the marker segments up to the start-of-frame, noting the EXIF orientation on the way"""
+        image_file.seek(2)
+        orientation = 1
+        while True:
+            byte = image_file.read(1)
+            if byte != b"\xff":
+                return None
+            """Markers may be padded with any number of 0xFF fill bytes"""
+            while byte == b"\xff":
+                byte = image_file.read(1)
+            if not byte:
+                return None
+            marker = byte[0]
+            if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+                continue
+            if marker in (0xD9, 0xDA):
+                """End of image or start of scan before any frame header"""
+                return None
+            length = struct.unpack(">H", image_file.read(2))[0]
+            if marker in self.JPEG_SOF_MARKERS:
+                precision, height, width = struct.unpack(">BHH", image_file.read(5))
+                return self.oriented(width, height, orientation)
+            segment = image_file.read(length - 2)
+            if marker == 0xE1 and segment.startswith(b"Exif\x00\x00"):
+                tiff = segment[6:]
+                orientation = self.ifd_values(lambda offset, size: tiff[offset:offset + size]).get(self.TIFF_ORIENTATION, 1)
+
+    def tiff_size(self, image_file) -> tuple:
+        def read_at(offset: int, size: int) -> bytes:
+            image_file.seek(offset)
+            return image_file.read(size)
+        values = self.ifd_values(read_at)
+        if self.TIFF_WIDTH not in values or self.TIFF_HEIGHT not in values:
+            return None
+        return self.oriented(values[self.TIFF_WIDTH], values[self.TIFF_HEIGHT], values.get(self.TIFF_ORIENTATION, 1))
+
+    def ifd_values(self, read_at) -> dict:
+        """SHORT and LONG values of the first TIFF image file directory, read_at(offset, size) reads the TIFF bytes"""
+        header = read_at(0, 8)
+        byte_order = "<" if header[:2] == b"II" else ">"
+        ifd_offset = struct.unpack(byte_order + "I", header[4:8])[0]
+        entry_count = struct.unpack(byte_order + "H", read_at(ifd_offset, 2))[0]
+        entries = read_at(ifd_offset + 2, entry_count * 12)
+        values = {}
+        for index in range(len(entries) // 12):
+            tag, value_type, count, value = struct.unpack(byte_order + "HHI4s", entries[index * 12:index * 12 + 12])
+            if value_type == 3:
+                values[tag] = struct.unpack(byte_order + "H", value[:2])[0]
+            elif value_type == 4:
+                values[tag] = struct.unpack(byte_order + "I", value)[0]
+        return values
+
+    def oriented(self, width: int, height: int, orientation: int) -> tuple:
+        if orientation in (5, 6, 7, 8):
+            return height, width
+        return width, height
@@ -0,0 +1,186 @@
+import os
+import re
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from helper.ocr_engine import tesseract_engine
+from helper.ocr_text import OCRText
+from helper.document_context import document_contexts
+from helper.qr_detector import qr_detector
+
+class OCRCache:
+    """
+        Per-document cache of tesseract results, keyed by (image, lang, psm, oem)
+        Classification and every extractor read through it, so each OCR configuration runs at most once per document
+        With a disk cache attached, results are also looked up by image content across documents
+        One cache per worker process: a worker runs the OCR of one document at a time
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.results = {}
+        self.document_calls = 0
+        self.document_hits = 0
+        self.total_calls = 0
+        self.total_hits = 0
+        self.image_hashes = {}
+        self.disk_cache = None
+        self.thread_budget = 1
+        self.executor = None
+
+    def set_thread_budget(self, threads: int):
+        """OCR passes of one document that may run at the same time"""
+        self.thread_budget = max(threads, 1)
+        if self.thread_budget > 1:
+            self.executor = ThreadPoolExecutor(self.thread_budget, thread_name_prefix="ocr")
+
+    def attach_disk_cache(self, disk_cache: object):
+        """Back the per-document cache with the persistent content-hash cache"""
+        self.disk_cache = disk_cache
+
+    def image_key(self, image) -> tuple:
+        """The file version is part of the key, a rewritten image is OCRed again"""
+        image_path = os.path.abspath(str(image))
+        try:
+            stat = os.stat(image_path)
+            return (image_path, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return (image_path, None, None)
+
+    def ocr_key(self, output: str, image, lang: str, config: str, region_name: str = "") -> tuple:
+        """Normalize the tesseract options, e.g. lang="eng" and config "-l eng --oem 3" are the same run"""
+        config = config or ""
+        lang_option = re.search(r'-l\s+(\S+)', config)
+        if lang_option:
+            lang = lang_option.group(1)
+        psm_option = re.search(r'--psm\s+(\d+)', config)
+        oem_option = re.search(r'--oem\s+(\d+)', config)
+        other_options = " ".join(re.sub(r'-l\s+\S+|--psm\s+\d+|--oem\s+\d+', ' ', config).split())
+        return (
+            output,
+            self.image_key(image),
+            lang or "eng",
+            int(psm_option.group(1)) if psm_option else 3,
+            int(oem_option.group(1)) if oem_option else 3,
+            other_options,
+            region_name
+        )
+
+    def content_hash(self, image_key: tuple) -> str:
+        """SHA-256 of the image bytes, computed once per image version"""
+        if image_key not in self.image_hashes:
+            with open(image_key[0], "rb") as image_file:
+                self.image_hashes[image_key] = hashlib.sha256(image_file.read()).hexdigest()
+        return self.image_hashes[image_key]
+
+    def disk_key(self, key: tuple) -> str:
+        """Same as the in-memory key, with the image content hash in place of the file path"""
+        output, image_key, *options = key
+        if self.disk_cache is None or image_key[1] is None:
+            return None
+        return "|".join([self.content_hash(image_key), output] + [str(option) for option in options])
+
+    def run(self, key: tuple, compute, tesseract: bool = True):
+        with self.lock:
+            if key in self.results:
+                if tesseract:
+                    self.document_hits += 1
+                return self.results[key]
+
+        """Results of an earlier document with the same image bytes"""
+        disk_key = self.disk_key(key)
+        result = self.disk_cache.get(disk_key) if disk_key is not None else None
+        if result is not None:
+            if tesseract:
+                with self.lock:
+                    self.document_hits += 1
+        else:
+            result = compute()
+            if tesseract:
+                with self.lock:
+                    self.document_calls += 1
+            if disk_key is not None:
+                self.disk_cache.put(disk_key, result)
+
+        with self.lock:
+            self.results[key] = result
+        return result
+
+    def image_to_data(self, image, lang: str = None, config: str = "", region: tuple = None) -> dict:
+        """
+            region: optional (name, image) derived from the image file, e.g. a downscaled crop
+            The region image is OCRed and cached under the file plus the region name
+        """
+        region_name, region_image = region if region is not None else ("", None)
+        key = self.ocr_key("data", image, lang, config, region_name)
+        output, image_key, lang, psm, oem, other_options, region_name = key
+        def compute():
+            source = region_image if region_image is not None else self.ocr_source(image, other_options)
+            return tesseract_engine.image_to_data(source, lang, psm, oem, other_options, config)
+        return self.run(key, compute)
+
+    def ocr_source(self, image, other_options: str = ""):
+        """The decoded image of the document for the in-process engine, the file for the tesseract subprocess"""
+        if not isinstance(image, (str, os.PathLike)):
+            return image
+        document_context = document_contexts.context(image)
+        if tesseract_engine.in_process and not other_options:
+            return document_context.pil()
+        document_context.count_file_decode()
+        return image
+
+    def image_to_string(self, image, lang: str = None, config: str = "", region: tuple = None) -> str:
+        """Rebuilt from the image_to_data result of the same configuration, one tesseract run serves both"""
+        return OCRText(self.image_to_data(image, lang, config, region)).text()
+
+    def prefetch(self, image, passes: list):
+        """
+            Run the independent OCR passes (lang, config) an extractor needs concurrently and wait for all of them
+            The extractor then reads every pass from the cache
+        """
+        pending = {}
+        for lang, config in passes:
+            key = self.ocr_key("data", image, lang, config)
+            with self.lock:
+                if key in self.results:
+                    continue
+            pending.setdefault(key, (lang, config))
+        if self.executor is None or len(pending) < 2:
+            return
+        futures = [self.executor.submit(self.image_to_data, image, lang, config) for lang, config in pending.values()]
+        for future in futures:
+            future.result()
+
+    def detect_qr_codes(self, image_path: str) -> list:
+        """QR code detections (bounding box and confidence) of the image, finder-pattern tier first, then QReader"""
+        def detect():
+            document_context = document_contexts.context(image_path)
+            image = document_context.bgr()
+            gray = document_context.gray() if image is not None else None
+            return [
+                {"bbox_xyxy": [float(value) for value in found_qr['bbox_xyxy']], "confidence": float(found_qr['confidence'])}
+                for found_qr in qr_detector.detect(image, gray)
+            ]
+        detector = "finder+qreader" if qr_detector.fast_path else "qreader"
+        return self.run(("qr", self.image_key(image_path), detector), detect, tesseract=False)
+
+    def finish_document(self) -> dict:
+        """Drop the cached results of the document and return its tesseract calls and the calls saved"""
+        with self.lock:
+            stats = {"tesseractCalls": self.document_calls, "tesseractCallsSaved": self.document_hits}
+            self.total_calls += self.document_calls
+            self.total_hits += self.document_hits
+            self.results.clear()
+            self.image_hashes.clear()
+            self.document_calls = 0
+            self.document_hits = 0
+            return stats
+
+    def snapshot(self) -> dict:
+        """Tesseract calls run and saved since the previous snapshot"""
+        with self.lock:
+            snapshot = {"tesseractCalls": self.total_calls, "tesseractCallsSaved": self.total_hits}
+            self.total_calls = 0
+            self.total_hits = 0
+            return snapshot
+
+ocr_cache = OCRCache()
@@ -0,0 +1,78 @@
+import os
+import json
+import sqlite3
+import threading
+from time import time
+
+class OCRDiskCache:
+    """
+        Persistent OCR/QR result cache in a SQLite file under the workspace
+        Keys are the SHA-256 of the image bytes plus the OCR configuration, so a resubmitted scan is not OCRed again
+        The file is bounded to `max_bytes`, least recently used entries are evicted first
+        The size is checked every `evict_every` puts, not on each one, so the file may exceed the bound by that many results
+        Shared by every worker process of the node
+    """
+    def __init__(self, workspace_path: str, max_bytes: int, evict_every: int = 64) -> None:
+        self.cache_path = os.path.join(workspace_path, "ocr_cache.sqlite3")
+        self.max_bytes = max_bytes
+        self.evict_every = max(evict_every, 1)
+        self.puts = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.connection = sqlite3.connect(self.cache_path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS ocr_results_last_used ON ocr_results (last_used)")
+        self.connection.commit()
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM ocr_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE ocr_results SET last_used = ? WHERE key = ?", (time(), key))
+            self.connection.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key: str, value):
+        value = json.dumps(value)
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO ocr_results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time())
+            )
+            self.puts += 1
+            if self.puts % self.evict_every == 0:
+                self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes (the file is shared with the other workers, so sum it)"""
+        total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        evicted_keys = []
+        for key, size in self.connection.execute("SELECT key, size FROM ocr_results ORDER BY last_used"):
+            if total_bytes <= self.max_bytes:
+                break
+            evicted_keys.append((key,))
+            total_bytes -= size
+        self.connection.executemany("DELETE FROM ocr_results WHERE key = ?", evicted_keys)
+        self.evictions += len(evicted_keys)
+
+    def snapshot(self) -> dict:
+        """Hits, misses and evictions since the previous snapshot"""
+        with self.lock:
+            snapshot = {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            return snapshot
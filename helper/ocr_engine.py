@@ -0,0 +1,97 @@
+import threading
+import configparser
+import pytesseract
+from PIL import Image
+
+"""tesserocr is optional, without it every call goes through the pytesseract subprocess"""
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+class TesseractEnginePool:
+    """
+        In-process tesseract: one initialized tesserocr API handle per language set, kept for the life of the worker
+        The page segmentation mode is set on the handle per call, the engine mode is fixed at init (always 3 in this repo)
+        No process spawn and no traineddata load per call, and images can be passed as PIL images or numpy arrays
+        Returns the same dict as pytesseract.image_to_data(..., output_type=Output.DICT)
+    """
+    TSV_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                   "left", "top", "width", "height", "conf", "text")
+
+    def __init__(self) -> None:
+        """Read config.ini"""
+        config = configparser.ConfigParser(allow_no_value=True)
+        config.read(r'C:\Program Files (x86)\OCRR\config\config.ini')
+        backend = config.get('OCR', 'Backend', fallback="auto").lower()
+        self.tessdata_path = config.get('OCR', 'TessdataPath', fallback="") or None
+        self.in_process = tesserocr is not None and backend in ("auto", "tesserocr")
+
+        self.lock = threading.Lock()
+        self.engines = {}
+
+    def engine(self, lang: str, oem: int) -> tuple:
+        """Initialize the handle for a language set once, tesserocr handles are not thread safe"""
+        with self.lock:
+            key = (lang, oem)
+            if key not in self.engines:
+                options = {"lang": lang, "oem": oem}
+                if self.tessdata_path:
+                    options["path"] = self.tessdata_path
+                self.engines[key] = (tesserocr.PyTessBaseAPI(**options), threading.Lock())
+            return self.engines[key]
+
+    def warm_up(self):
+        """Load the language sets the extractors use before the first document"""
+        if not self.in_process:
+            pytesseract.get_tesseract_version()
+            return
+        for lang in ("eng", "hin+eng"):
+            self.engine(lang, 3)
+
+    def load_image(self, image) -> Image.Image:
+        if isinstance(image, Image.Image):
+            return image
+        if hasattr(image, "shape"):
+            """numpy array as read by cv2 (BGR)"""
+            if len(image.shape) == 3:
+                return Image.fromarray(image[:, :, ::-1])
+            return Image.fromarray(image)
+        return Image.open(image)
+
+    def image_to_data(self, image, lang: str, psm: int, oem: int, other_options: str = "", config: str = "") -> dict:
+        """Extra tesseract options (e.g. -c variables) are only supported through pytesseract"""
+        if not self.in_process or other_options:
+            return pytesseract.image_to_data(self.pytesseract_image(image), lang=lang, config=config,
+                                             output_type=pytesseract.Output.DICT)
+
+        api, api_lock = self.engine(lang, oem)
+        with api_lock:
+            api.SetPageSegMode(psm)
+            api.SetImage(self.load_image(image))
+            tsv = api.GetTSVText(0)
+        return self.tsv_to_dict(tsv)
+
+    def pytesseract_image(self, image):
+        if hasattr(image, "shape") and len(image.shape) == 3:
+            """pytesseract expects RGB arrays"""
+            return image[:, :, ::-1]
+        return image
+
+    def tsv_to_dict(self, tsv: str) -> dict:
+        data = {column: [] for column in self.TSV_COLUMNS}
+        for row in tsv.splitlines():
+            values = row.split("\t")
+            if len(values) < len(self.TSV_COLUMNS) - 1:
+                continue
+            values += [""] * (len(self.TSV_COLUMNS) - len(values))
+            for column, value in zip(self.TSV_COLUMNS, values):
+                if column == "text":
+                    data[column].append(value)
+                elif column == "conf":
+                    data[column].append(float(value))
+                else:
+                    data[column].append(int(value))
+        return data
+
+tesseract_engine = TesseractEnginePool()
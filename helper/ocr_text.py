@@ -0,0 +1,39 @@
+class OCRText:
+    """
+        Rebuild image_to_string style text from an image_to_data result
+        Words of a line are joined by spaces, lines by a newline and paragraphs/blocks by an empty line,
+        so splitlines() and the line regexes see the same lines as with image_to_string
+    """
+    def __init__(self, data: dict) -> None:
+        self.data = data
+
+    def text(self) -> str:
+        paragraphs = []
+        lines = []
+        words = []
+        line_key = None
+        paragraph_key = None
+        for i in range(len(self.data['text'])):
+            word = self.data['text'][i]
+            if self.data['level'][i] != 5 or not word.strip():
+                continue
+            page, block, par, line = (self.data['page_num'][i], self.data['block_num'][i],
+                                      self.data['par_num'][i], self.data['line_num'][i])
+            if (page, block, par, line) != line_key:
+                if words:
+                    lines.append(" ".join(words))
+                    words = []
+                line_key = (page, block, par, line)
+            if (page, block, par) != paragraph_key:
+                if lines:
+                    paragraphs.append("\n".join(lines))
+                    lines = []
+                paragraph_key = (page, block, par)
+            words.append(word.strip())
+        if words:
+            lines.append(" ".join(words))
+        if lines:
+            paragraphs.append("\n".join(lines))
+        if not paragraphs:
+            return ""
+        return "\n\n".join(paragraphs) + "\n"
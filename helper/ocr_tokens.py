@@ -0,0 +1,76 @@
+import numpy as np
+from helper.token_grid import TokenGrid
+
+"""One row per recognized word, columns as in tesseract's image_to_data"""
+TOKEN_DTYPE = np.dtype([
+    ("x1", np.int32), ("y1", np.int32), ("x2", np.int32), ("y2", np.int32),
+    ("conf", np.float32), ("block", np.int32), ("par", np.int32), ("line", np.int32), ("word", np.int32),
+    ("text", object)
+])
+
+"""Tesseract word confidence (0-100) above which a match is taken without further checks"""
+HIGH_CONFIDENCE = 85.0
+
+class OCRTokens:
+    """
+        Tokens of one OCR pass as a NumPy structured array (see TOKEN_DTYPE)
+        Behaves like the former list of (x1, y1, x2, y2, text) tuples: iteration, indexing, slicing and len()
+        The full columns, including conf and the block/par/line/word numbers, are in `tokens`
+    """
+    def __init__(self, tokens: np.ndarray) -> None:
+        self.tokens = tokens
+        self.tuples = None
+        self.token_grid = None
+
+    @classmethod
+    def from_data(cls, data: dict, keep=None) -> "OCRTokens":
+        """
+            data: image_to_data output (Output.DICT)
+            keep: text filter, by default empty and whitespace-only words are dropped
+        """
+        keep = keep or (lambda text: text.strip() != '')
+        indexes = [i for i, text in enumerate(data['text']) if keep(text)]
+        tokens = np.empty(len(indexes), dtype=TOKEN_DTYPE)
+        left = np.asarray(data['left'], dtype=np.int32)[indexes]
+        top = np.asarray(data['top'], dtype=np.int32)[indexes]
+        tokens['x1'] = left
+        tokens['y1'] = top
+        tokens['x2'] = left + np.asarray(data['width'], dtype=np.int32)[indexes]
+        tokens['y2'] = top + np.asarray(data['height'], dtype=np.int32)[indexes]
+        tokens['conf'] = np.asarray(data['conf'], dtype=np.float32)[indexes]
+        tokens['block'] = np.asarray(data['block_num'], dtype=np.int32)[indexes]
+        tokens['par'] = np.asarray(data['par_num'], dtype=np.int32)[indexes]
+        tokens['line'] = np.asarray(data['line_num'], dtype=np.int32)[indexes]
+        tokens['word'] = np.asarray(data['word_num'], dtype=np.int32)[indexes]
+        tokens['text'] = [data['text'][i] for i in indexes]
+        return cls(tokens)
+
+    def as_tuples(self) -> list:
+        """(x1, y1, x2, y2, text) with plain Python values, built once"""
+        if self.tuples is None:
+            self.tuples = list(zip(self.tokens['x1'].tolist(), self.tokens['y1'].tolist(),
+                                   self.tokens['x2'].tolist(), self.tokens['y2'].tolist(), self.tokens['text'].tolist()))
+        return self.tuples
+
+    def grid(self) -> TokenGrid:
+        """Spatial index over the token boxes, built on first use"""
+        if self.token_grid is None:
+            self.token_grid = TokenGrid(self)
+        return self.token_grid
+
+    def confident(self, min_conf: float = HIGH_CONFIDENCE) -> "OCRTokens":
+        return OCRTokens(self.tokens[self.tokens['conf'] >= min_conf])
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def __iter__(self):
+        return iter(self.as_tuples())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return OCRTokens(self.tokens[index])
+        return self.as_tuples()[index]
+
+    def __repr__(self) -> str:
+        return repr(self.as_tuples())
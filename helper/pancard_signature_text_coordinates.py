@@ -1,5 +1,5 @@
-import pytesseract
-import re
+from helper.ocr_cache import ocr_cache
+from helper.ocr_tokens import OCRTokens
 
 class SignatureTextCoordinates:
     def __init__(self, image_path, doc_type=None) -> None:
@@ -7,13 +7,7 @@ class SignatureTextCoordinates:
         self.doc_type = doc_type
     
     # func: generate coordinates
-    def generate_text_coordinates(self) -> list:
-        data = pytesseract.image_to_data(self.image_path, output_type=pytesseract.Output.DICT)
-        coordinates = []
-        for i in range(len(data['text'])):
-            text = data['text'][i]
-            x, y, w, h = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
-            # Filter out empty strings and  special characters
-            if text.strip() != '':
-                coordinates.append((x,y,x + w, y + h, text))
-        return coordinates
\ No newline at end of file
+    def generate_text_coordinates(self) -> OCRTokens:
+        data = ocr_cache.image_to_data(self.image_path)
+        # Filter out empty strings, keep confidence and layout with every token
+        return OCRTokens.from_data(data)
\ No newline at end of file
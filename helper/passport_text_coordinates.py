@@ -1,4 +1,5 @@
-import pytesseract
+from helper.ocr_cache import ocr_cache
+from helper.ocr_tokens import OCRTokens
 import re
 
 class TextCoordinates:
@@ -7,17 +8,11 @@ class TextCoordinates:
         
     
     # func: generate coordinates
-    def generate_text_coordinates(self) -> list:
+    def generate_text_coordinates(self) -> OCRTokens:
         tesseract_config = r'--oem 3 --psm 11'
-        data = pytesseract.image_to_data(self.image_path, output_type=pytesseract.Output.DICT, config=tesseract_config)
+        data = ocr_cache.image_to_data(self.image_path, config=tesseract_config)
         special_characters = r'[!@#$%^&*()_\-+{}\[\]:;,.?~\\|]'
-    
-        coordinates = []
 
-        for i in range(len(data['text'])):
-            text = data['text'][i]
-            x, y, w, h = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
-            # Filter out empty strings and  special characters
-            if not re.search(special_characters, text) and len(text) != 0:
-                coordinates.append((x,y,x + w, y + h, text))
-        return coordinates
\ No newline at end of file
+
+        # Filter out empty strings and  special characters, keep confidence and layout with every token
+        return OCRTokens.from_data(data, keep=lambda text: not re.search(special_characters, text) and len(text) != 0)
\ No newline at end of file
@@ -0,0 +1,109 @@
+import cv2
+import threading
+import configparser
+from time import perf_counter
+from ocrr_log_mgmt.ocrr_log import OCRREngineLogging
+
+class QRDetectorService:
+    """
+        QR code locator of the worker process, in tiers
+        - finder: OpenCV's finder-pattern detector on a grayscale copy downscaled to at most FastPathMaxSide pixels
+        - service: QReader in the engine's QR batch service, batched with the other workers' images (when attached)
+        - qreader: the QReader neural detector of this worker, when the tiers before found nothing or the service did not answer
+        One QReader per worker process, created on the first detection that reaches it and reused for every later document
+        qreader (and torch with it) is only imported then, a worker that never needs it does not load the model
+    """
+    TIERS = ("finder", "service", "qreader")
+
+    def __init__(self) -> None:
+        """Read config.ini"""
+        config = configparser.ConfigParser(allow_no_value=True)
+        config.read(r'C:\Program Files (x86)\OCRR\config\config.ini')
+        self.fast_path = config.getboolean('QR', 'FastPath', fallback=True)
+        self.fast_path_max_side = config.getint('QR', 'FastPathMaxSide', fallback=1000)
+
+        self.lock = threading.Lock()
+        self.detect_lock = threading.Lock()
+        self.qreader = None
+        self.load_seconds = None
+        self.batch_client = None
+        self.tier_stats = {tier: {"attempts": 0, "hits": 0, "seconds": 0.0} for tier in self.TIERS}
+
+    def attach_batch_client(self, batch_client: object):
+        """Send QReader detections to the engine's QR batch service"""
+        self.batch_client = batch_client
+
+    def reader(self) -> object:
+        with self.lock:
+            if self.qreader is None:
+                load_start = perf_counter()
+                from qreader import QReader
+                self.qreader = QReader()
+                self.load_seconds = perf_counter() - load_start
+                OCRREngineLogging().configure_logger().info(f"| QReader model loaded in {self.load_seconds:.2f}s")
+            return self.qreader
+
+    def detect(self, image, gray=None) -> list:
+        """
+            Detections of a cv2 image as QReader returns them, a list of {"bbox_xyxy", "confidence"}
+            The finder tier has no score, its detections have confidence 1.0
+        """
+        if self.fast_path and image is not None:
+            found_qrs = self.timed("finder", lambda: self.detect_finder_patterns(image if gray is None else gray))
+            if found_qrs:
+                return found_qrs
+        if self.batch_client is not None and image is not None and self.batch_client.available():
+            found_qrs = self.timed("service", lambda: self.batch_client.detect(image))
+            if found_qrs is not None:
+                return found_qrs
+        """No batch service, or it did not answer: detect on this worker's own model"""
+        qreader = self.reader()
+        return self.timed("qreader", lambda: self.detect_qreader(qreader, image))
+
+    def timed(self, tier: str, detect) -> list:
+        detect_start = perf_counter()
+        found_qrs = detect()
+        with self.lock:
+            self.tier_stats[tier]["attempts"] += 1
+            self.tier_stats[tier]["hits"] += 1 if found_qrs else 0
+            self.tier_stats[tier]["seconds"] += perf_counter() - detect_start
+        return found_qrs
+
+    def detect_finder_patterns(self, image) -> list:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+        height, width = gray.shape[:2]
+        scale = min(self.fast_path_max_side / max(height, width), 1.0)
+        if scale < 1.0:
+            gray = cv2.resize(gray, (max(int(width * scale), 1), max(int(height * scale), 1)), interpolation=cv2.INTER_AREA)
+
+        """detectMulti misses some lone codes that detect finds"""
+        qr_code_detector = cv2.QRCodeDetector()
+        found, points = qr_code_detector.detectMulti(gray)
+        if not found or points is None:
+            found, points = qr_code_detector.detect(gray)
+        if not found or points is None:
+            return []
+        points = points.reshape(-1, 4, 2)
+
+        """Corner points back to full-size (x1, y1, x2, y2) boxes"""
+        found_qrs = []
+        for corners in points:
+            x1, y1 = max(float(corners[:, 0].min()) / scale, 0.0), max(float(corners[:, 1].min()) / scale, 0.0)
+            x2, y2 = min(float(corners[:, 0].max()) / scale, float(width)), min(float(corners[:, 1].max()) / scale, float(height))
+            if x2 > x1 and y2 > y1:
+                found_qrs.append({"bbox_xyxy": [x1, y1, x2, y2], "confidence": 1.0})
+        return found_qrs
+
+    def detect_qreader(self, qreader: object, image) -> list:
+        """One detection at a time on the shared model"""
+        with self.detect_lock:
+            return qreader.detect(image)
+
+    def snapshot(self) -> dict:
+        """Attempts, hits and time per tier since the previous snapshot"""
+        with self.lock:
+            snapshot = {tier: {**stats, "seconds": round(stats["seconds"], 3)} for tier, stats in self.tier_stats.items()}
+            self.tier_stats = {tier: {"attempts": 0, "hits": 0, "seconds": 0.0} for tier in self.TIERS}
+            return snapshot
+
+qr_detector = QRDetectorService()
@@ -0,0 +1,70 @@
+from collections import defaultdict
+
+class TokenGrid:
+    """
+        Uniform grid over the token boxes of one OCR pass, for neighbour and same-line queries
+        Tokens are referred to by their index in the OCRTokens
+        Two tokens are on the same line when they overlap vertically by at least half the smaller height
+    """
+    def __init__(self, tokens: object, cell_size: int = None) -> None:
+        self.boxes = [(x1, y1, x2, y2) for x1, y1, x2, y2, text in tokens]
+        self.texts = [text for x1, y1, x2, y2, text in tokens]
+        self.width = max((x2 for x1, y1, x2, y2 in self.boxes), default=0)
+
+        """Cells a few text lines high, so a line query touches few cells"""
+        heights = sorted(y2 - y1 for x1, y1, x2, y2 in self.boxes)
+        median_height = heights[len(heights) // 2] if heights else 16
+        self.cell_size = cell_size or max(median_height * 4, 16)
+
+        self.cells = defaultdict(list)
+        for index, (x1, y1, x2, y2) in enumerate(self.boxes):
+            for cell_x in range(x1 // self.cell_size, x2 // self.cell_size + 1):
+                for cell_y in range(y1 // self.cell_size, y2 // self.cell_size + 1):
+                    self.cells[(cell_x, cell_y)].append(index)
+
+        """Substring index, built per substring length on first use"""
+        self.substrings = {}
+
+    def query(self, x1: int, y1: int, x2: int, y2: int) -> list:
+        """Indexes of the tokens whose box intersects the rectangle, in reading order"""
+        found = set()
+        for cell_x in range(x1 // self.cell_size, x2 // self.cell_size + 1):
+            for cell_y in range(y1 // self.cell_size, y2 // self.cell_size + 1):
+                for index in self.cells.get((cell_x, cell_y), ()):
+                    bx1, by1, bx2, by2 = self.boxes[index]
+                    if bx1 <= x2 and bx2 >= x1 and by1 <= y2 and by2 >= y1:
+                        found.add(index)
+        return sorted(found)
+
+    def same_line(self, index: int, other: int) -> bool:
+        x1, y1, x2, y2 = self.boxes[index]
+        ox1, oy1, ox2, oy2 = self.boxes[other]
+        overlap = min(y2, oy2) - max(y1, oy1)
+        return overlap >= 0.5 * min(y2 - y1, oy2 - oy1)
+
+    def line_tokens(self, index: int) -> list:
+        """Tokens on the same line as the token, left to right"""
+        x1, y1, x2, y2 = self.boxes[index]
+        candidates = self.query(0, y1, self.width, y2)
+        return sorted((other for other in candidates if self.same_line(index, other)), key=lambda other: self.boxes[other][0])
+
+    def left_of(self, index: int) -> list:
+        """Tokens left of the token on the same line, nearest first"""
+        x1 = self.boxes[index][0]
+        return [other for other in reversed(self.line_tokens(index)) if other != index and self.boxes[other][2] <= x1 + 1]
+
+    def right_of(self, index: int) -> list:
+        """Tokens right of the token on the same line, nearest first"""
+        x2 = self.boxes[index][2]
+        return [other for other in self.line_tokens(index) if other != index and self.boxes[other][0] >= x2 - 1]
+
+    def containing(self, text: str) -> list:
+        """Indexes of the tokens whose text contains `text`, in reading order (same as `text in token` on every token)"""
+        length = len(text)
+        if length not in self.substrings:
+            substrings = defaultdict(set)
+            for index, token_text in enumerate(self.texts):
+                for start in range(len(token_text) - length + 1):
+                    substrings[token_text[start:start + length]].add(index)
+            self.substrings[length] = substrings
+        return sorted(self.substrings[length].get(text, ()))
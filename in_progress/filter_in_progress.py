@@ -1,105 +1,292 @@
 from config.database import MongoDBConnection
+from task_lease.task_lease import TaskLease
+from task_lease.active_tasks import ActiveTasks
+from ocrr_log_mgmt.ocrr_log import OCRREngineLogging
+from pymongo.errors import PyMongoError, OperationFailure
+from collections import OrderedDict
 from time import sleep
+import configparser
+import os
 import sys
 
 class FilterInProgressDocuments:
-    def __init__(self, upload_path: str, in_progress_queue: object) -> None:
+    def __init__(self, upload_path: str, in_progress_queue: object, active_tasks: object = None) -> None:
         self.upload_path = upload_path
         self.in_progress_queue = in_progress_queue
+        """Tasks of this node still to finish, their leases are renewed on the heartbeat"""
+        self.active_tasks = active_tasks if active_tasks is not None else ActiveTasks()
+
+        """Logger"""
+        logger_config = OCRREngineLogging()
+        self.logger = logger_config.configure_logger()
+
+        """Read config.ini"""
+        config = configparser.ConfigParser(allow_no_value=True)
+        config.read(r'C:\Program Files (x86)\OCRR\config\config.ini')
+        self.intake_mode = config.get('Intake', 'Mode', fallback="changestream").lower()
+        self.poll_interval = config.getint('Intake', 'PollInterval', fallback=5)
+        self.intake_batch_size = config.getint('Intake', 'BatchSize', fallback=500)
+        self.sweep_projection = {"_id": True, "taskId": True, "status": True, "clientId": True, "uploadDir": True, "priority": True}
+        """clientId -> None, in the order clients were last served by a sweep"""
+        self.client_turns = OrderedDict()
 
         try:
             """Establish connection with upload DB"""
             connection = MongoDBConnection()
-            client = connection.get_connection()
-            db_upload = client["upload"]
+            self.client = connection.get_connection()
+            db_upload = self.client["upload"]
             self.collection_filedetails = db_upload["fileDetails"]
 
             """Establish connection with ocrrworkspace DB """
-            db_ocrrworkspace = client["ocrrworkspace"]
+            db_ocrrworkspace = self.client["ocrrworkspace"]
             self.collection_ocrr = db_ocrrworkspace['ocrr']
+            self.collection_resume_tokens = db_ocrrworkspace['resumeTokens']
+
+            """Atomic task leases shared by every OCRR node"""
+            self.task_lease = TaskLease(self.collection_ocrr)
         except Exception as e:
             print(f"Error establishing MongoDB connection: {e}")
             sys.exit(1)
 
-    
+    def start_intake(self):
+        """
+            Use change streams when the deployment supports them
+            Fall back to polling for standalone MongoDB
+        """
+        if self.intake_mode == "changestream" and self.supports_change_streams():
+            self.logger.info("| Intake mode: change stream")
+            self.watch_in_progress_status()
+        else:
+            self.logger.info(f"| Intake mode: polling every {self.poll_interval} seconds")
+            self.query_in_progress_status()
+
+    def supports_change_streams(self) -> bool:
+        """Change streams are only available on replica sets and sharded clusters"""
+        try:
+            hello = self.client.admin.command("hello")
+            return "setName" in hello or hello.get("msg") == "isdbgrid"
+        except PyMongoError as e:
+            self.logger.error(f"| Unable to detect MongoDB topology: {e}")
+            return False
+
     def query_in_progress_status(self):
         """
             Query database with filter status:IN_PROGRESS
             Put the absolute document path in queue
         """
         try:
-            query = {"status": "IN_PROGRESS"}
             while True:
-                documents = self.collection_filedetails.find(query)
-                document_path = ""
-                document_sub_path = ""
-                document_path_list = []
-
-                for document in documents:
-                    document_path_list = document['uploadDir'].split('/')
-                    for i in range(len(document_path_list)):
-                        if len(document_path_list[i]) !=0:
-                            document_sub_path += '\\'+document_path_list[i]
-
-                    document_path = self.upload_path+document_sub_path
-                    status = document['status']
-                    clientid = document['clientId']
-                    taskid = document['taskId']
-                    uploaddir = document['uploadDir']
-
-                    """Insert document info. into ocrrworkspace"""
-                    self.insert_inprogress_document_info(taskid, document_path, status, clientid, uploaddir)
-                    document_path = ""
-                    document_sub_path = ""
-                    document_path_list = []
-                sleep(5)
+                self.sweep_in_progress_documents()
+                sleep(self.poll_interval)
 
         except Exception as e:
             print(f"Error establishing MongoDB connection: {e}")
             sys.exit(1)
 
+    def sweep_in_progress_documents(self) -> bool:
+        """
+            Admit IN_PROGRESS documents until the scheduler queue is full, choosing them by priority and client
+            Highest priority first; within a priority, clients take turns, each round gives every client a share of the
+            free capacity by its scheduler weight (at most BatchSize), fetched with one find on that client's documents
+            Only what is admitted is read, one client's backlog can not crowd the others out of the queue
+            Per client, documents are paged by _id, so documents leased by another node do not hide the ones after them
+            Returns False when the sweep stopped early because of backpressure
+        """
+        pending_clients = self.pending_clients()
+        for priority in sorted(pending_clients, key=lambda priority: int(priority or 0), reverse=True):
+            clients = pending_clients[priority]
+            while clients:
+                free_capacity = self.in_progress_queue.free_capacity()
+                if free_capacity == 0:
+                    self.logger.info("| Scheduler queue is full, remaining IN_PROGRESS documents wait for the next sweep")
+                    return False
+                for clientid, share in self.client_shares(list(clients), free_capacity):
+                    query = {"status": "IN_PROGRESS", "clientId": clientid, "priority": {"$in": [0, None]} if priority == 0 else priority}
+                    if clients[clientid] is not None:
+                        query["_id"] = {"$gt": clients[clientid]}
+                    documents = list(self.collection_filedetails.find(query, self.sweep_projection).sort("_id", 1).limit(share))
+                    self.admit_documents([self.build_document_info(document) for document in documents])
+                    self.client_turns.move_to_end(clientid)
+                    if len(documents) < share:
+                        del clients[clientid]
+                    else:
+                        clients[clientid] = documents[-1]['_id']
+        return True
 
+    def pending_clients(self) -> dict:
+        """priority -> {clientId: last _id read}, for every client with IN_PROGRESS documents, from one aggregation"""
+        groups = self.collection_filedetails.aggregate([
+            {"$match": {"status": "IN_PROGRESS"}},
+            {"$group": {"_id": {"clientId": "$clientId", "priority": {"$ifNull": ["$priority", 0]}}}}
+        ])
+        pending_clients = {}
+        for group in groups:
+            pending_clients.setdefault(group['_id']['priority'], {})[group['_id']['clientId']] = None
+        return pending_clients
 
-    def insert_inprogress_document_info(self, taskid: str, document_path: str, status: str, clientid: str, uploaddir: str):
+    def client_shares(self, clientids: list, free_capacity: int) -> list:
         """
-            Insert new IN_PROGRESS status document info. in ocrrworkspace DB
-            Put the absolute document path in queue
+            (clientId, documents to read) for one round, the clients served longest ago first
+            Shares follow the scheduler's client weights; with more clients than free slots, the round ends when the slots do
         """
+        for clientid in clientids:
+            self.client_turns.setdefault(clientid, None)
+        turn_order = {clientid: turn for turn, clientid in enumerate(self.client_turns)}
+        clientids = sorted(clientids, key=turn_order.get)
+
+        weights = {clientid: self.in_progress_queue.weight(clientid) for clientid in clientids}
+        total_weight = sum(weights.values())
+        shares = []
+        for clientid in clientids:
+            share = min(max(free_capacity * weights[clientid] // total_weight, 1), self.intake_batch_size)
+            share = min(share, free_capacity - sum(share for _, share in shares))
+            if share <= 0:
+                break
+            shares.append((clientid, share))
+        return shares
+
+    def admit_documents(self, document_infos: list) -> int:
+        """Claim a batch of tasks for this node and queue the ones it got"""
         try:
-            if self.check_existing_taskid(taskid):
-                document_info = {
-                    "taskId": taskid,
-                    "path": document_path,
-                    "status": status,
-                    "clientId": clientid,
-                    "taskResult": "",
-                    "uploadDir": uploaddir
-                }
-                self.collection_ocrr.insert_one(document_info)
+            claimed_documents = self.task_lease.claim_many(document_infos)
+            for document_info in claimed_documents:
+                self.active_tasks.add(document_info['taskId'])
                 self.in_progress_queue.put(document_info)
-                self.update_inprogress_status(taskid)
+            if claimed_documents:
+                self.collection_filedetails.update_many(
+                    {"taskId": {"$in": [document_info['taskId'] for document_info in claimed_documents]}},
+                    {"$set": {"status": "IN_QUEUE"}}
+                )
+            return len(claimed_documents)
         except Exception as e:
-            print(f"Error establishing MongoDB connection: {e}")
+            print(f"Error admitting IN_PROGRESS documents: {e}")
             sys.exit(1)
 
-
-    def check_existing_taskid(self, taskid: str) -> bool:
+    def watch_in_progress_status(self):
+        """
+            Watch fileDetails for documents entering IN_PROGRESS
+            A change only triggers a sweep, the sweep chooses what to admit by priority and client
+        """
+        pipeline = [
+            {
+                "$match": {
+                    "operationType": {"$in": ["insert", "update", "replace"]},
+                    "fullDocument.status": "IN_PROGRESS"
+                }
+            }
+        ]
+        resume_token = self.get_resume_token()
         try:
-            query = {"taskId": taskid}
-            query_result = self.collection_ocrr.find_one(query)
-            if not query_result:
-                return True
-            return False
+            while True:
+                try:
+                    with self.collection_filedetails.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+                        """Catch up on documents that are already IN_PROGRESS"""
+                        sweep_pending = True
+
+                        while stream.alive:
+                            """Sweep once the scheduler has room, waiting for it at most a second so the stream keeps being read"""
+                            if sweep_pending and self.in_progress_queue.wait_for_capacity(timeout=1):
+                                sweep_pending = not self.sweep_in_progress_documents()
+
+                            change = stream.try_next()
+                            if change is None:
+                                continue
+                            """The document stays IN_PROGRESS until a sweep admits it, the stream can move on"""
+                            sweep_pending = True
+                            resume_token = stream.resume_token
+                            self.save_resume_token(resume_token)
+                except OperationFailure as e:
+                    if resume_token is None:
+                        raise
+                    """Resume token is no longer in the oplog, start a fresh stream"""
+                    self.logger.error(f"| Unable to resume change stream: {e}")
+                    resume_token = None
+                    self.save_resume_token(resume_token)
+                except PyMongoError as e:
+                    self.logger.error(f"| Change stream interrupted, resuming: {e}")
+                    sleep(self.poll_interval)
+
         except Exception as e:
-            print(f"Error establishing MongoDB connection: {e}")
+            print(f"Error watching fileDetails change stream: {e}")
             sys.exit(1)
 
+    def get_resume_token(self):
+        token_document = self.collection_resume_tokens.find_one({"_id": "fileDetails"})
+        if token_document:
+            return token_document["token"]
+        return None
+
+    def save_resume_token(self, resume_token):
+        self.collection_resume_tokens.update_one(
+            {"_id": "fileDetails"},
+            {"$set": {"token": resume_token}},
+            upsert=True
+        )
+
+    def build_document_info(self, document: dict) -> dict:
+        """Build the absolute document path from uploadDir"""
+        document_sub_path = ""
+        document_path_list = document['uploadDir'].split('/')
+        for i in range(len(document_path_list)):
+            if len(document_path_list[i]) !=0:
+                document_sub_path += '\\'+document_path_list[i]
+
+        document_path = self.upload_path+document_sub_path
+        return {
+            "taskId": document['taskId'],
+            "path": document_path,
+            "status": document['status'],
+            "clientId": document['clientId'],
+            "priority": document.get('priority', 0),
+            "taskResult": "",
+            "uploadDir": document['uploadDir']
+        }
+
+    def maintain_leases(self):
+        """
+            Heartbeat the leases of the tasks this node still has queued or in flight
+            Take over tasks whose lease expired (crashed node or worker) while the scheduler has room
+            A task that failed MaxAttempts times is rejected instead of being queued again
+            A failed heartbeat (e.g. MongoDB unreachable) is retried sooner, doubling the wait up to the heartbeat interval
+        """
+        retry_interval = 1
+        while True:
+            try:
+                self.task_lease.renew(self.active_tasks.snapshot())
+                while self.in_progress_queue.wait_for_capacity(block=False):
+                    document_info = self.task_lease.reclaim_expired()
+                    if document_info is None:
+                        break
+                    if self.task_lease.exhausted(document_info):
+                        self.reject_failed_task(document_info)
+                        continue
+                    self.logger.info(f"| Reclaimed expired lease for task {document_info['taskId']}, attempt {document_info['attempts']}")
+                    self.active_tasks.add(document_info['taskId'])
+                    self.in_progress_queue.put(document_info)
+                    self.update_inprogress_status(document_info['taskId'])
+                retry_interval = 1
+                sleep(self.task_lease.heartbeat_interval)
+            except Exception as e:
+                self.logger.error(f"| Error maintaining task leases, retrying in {retry_interval}s: {e}")
+                sleep(retry_interval)
+                retry_interval = min(retry_interval * 2, self.task_lease.heartbeat_interval)
+
+    def reject_failed_task(self, document_info: dict):
+        """Reject the document in fileDetails and drop the task with its workspace copy"""
+        taskid = document_info['taskId']
+        failed_attempts = document_info['attempts'] - 1
+        self.logger.error(f"| Task {taskid} failed {failed_attempts} times, rejecting document {document_info['path']}")
+        self.collection_filedetails.update_one(
+            {"taskId": taskid},
+            {"$set": {"status": "REJECTED", "taskResult": f"Document processing failed {failed_attempts} times"}}
+        )
+        copied = document_info.get('checkpoint', {}).get('copied')
+        if copied and copied.get('data') and os.path.exists(copied['data']):
+            os.remove(copied['data'])
+        self.task_lease.abandon(taskid)
 
     def update_inprogress_status(self, taskid: str):
-        try:
-            query = {"taskId": taskid}
-            update = {"$set":{"status": "IN_QUEUE"}}
-            self.collection_filedetails.update_one(query, update)
-        except Exception as e:
-            print(f"Error updating in-progress status: {e}")
-            sys.exit(1)
+        """Errors are handled by the caller"""
+        query = {"taskId": taskid}
+        update = {"$set":{"status": "IN_QUEUE"}}
+        self.collection_filedetails.update_one(query, update)
@@ -1,10 +1,13 @@
 import configparser
 import threading
-import queue
+import multiprocessing
 import sys
 from config.database import MongoDBConnection
 from in_progress.filter_in_progress import FilterInProgressDocuments
-from process_documents.process_docs import ProcessDocuments
+from worker_pool.document_worker_pool import DocumentWorkerPool
+from task_scheduler.client_fair_queue import ClientFairQueue
+from task_lease.task_lease import TaskLease
+from task_lease.active_tasks import ActiveTasks
 from ocrr_log_mgmt.ocrr_log import OCRREngineLogging
 
 
@@ -24,27 +27,34 @@ class OCRREngine:
                 self.logger.info("| Connection established with MongoDB")
                 """Create OCRRWORKSPACE DB and OCRR collection"""
                 db_name_list = db_client.list_database_names()
+                database = db_client[database_name]
                 if database_name not in db_name_list:
                     self.logger.info(f"| Creating {database_name} database and {collection_name} collection")
-                    database = db_client[database_name]
                     database.create_collection(collection_name)
-                else:
-                    self.logger.info(f"| Reset {collection_name} collection")
-                    database = db_client[database_name]
-                    collection = database[collection_name]
-                    collection.drop()  
+                collection = database[collection_name]
+
+                """
+                    The collection is shared by every OCRR node, keep it and its leases
+                    Leases still held by this node are left over from an unclean shutdown, expire them
+                """
+                task_lease = TaskLease(collection)
+                task_lease.ensure_indexes()
+                released_leases = task_lease.release_owned()
+                self.logger.info(f"| OCRR node {task_lease.owner_id}: released {released_leases} leases from the previous run")
             else:
                 self.logger.error("| Failed to establish connection to MongoDB.")
                 self.logger.info("| Stopping OCRR Engine")
                 db_client.close()
                 sys.exit(1)
 
-            """Change status 'IN_QUEUE' to 'IN_PROGRESS'"""
+            """Change status 'IN_QUEUE' to 'IN_PROGRESS' for tasks that no node holds a lease record for"""
             db_upload = db_client["upload"]
             collection_filedetails = db_upload["fileDetails"]
+            leased_taskids = collection.distinct("taskId")
             collection_filedetails.update_many(
                 {
-                    "status": "IN_QUEUE"
+                    "status": "IN_QUEUE",
+                    "taskId": {"$nin": leased_taskids}
                 },
                 {
                     "$set": {
@@ -54,8 +64,22 @@ class OCRREngine:
             )
             db_client.close()
 
-            """"Set Queue objects"""
-            self.in_progress_queue = queue.Queue()
+            """Read scheduler settings"""
+            config = configparser.ConfigParser(allow_no_value=True)
+            config.optionxform = str
+            config.read(r'C:\Program Files (x86)\OCRR\config\config.ini')
+            scheduler_size = config.getint('Scheduler', 'QueueSize', fallback=100)
+            dispatch_size = config.getint('Engine', 'Workers', fallback=multiprocessing.cpu_count())
+            client_weights = {}
+            if config.has_section('ClientWeights'):
+                client_weights = {clientid: int(weight) for clientid, weight in config['ClientWeights'].items()}
+
+            """Set Queue objects: bounded, per-client fair queue fed by the intake thread"""
+            self.scheduler_queue = ClientFairQueue(scheduler_size, client_weights)
+            """Small queue shared with the worker processes, holds only what the workers are about to take"""
+            self.in_progress_queue = multiprocessing.Queue(maxsize=dispatch_size)
+            """Tasks of this node from admission until a worker finishes them, only their leases are renewed"""
+            self.active_tasks = ActiveTasks()
         except Exception as error:
             self.logger.error("| Failed to start OCRR Engine")
             sys.exit(1)
@@ -65,28 +89,39 @@ class OCRREngine:
         try:
             """
             Thread 1:
-                    Query filter upload database fileDetails collection for status:IN_PROGRESS
+                    Watch (or poll) upload database fileDetails collection for status:IN_PROGRESS
                     Put the absolute path in Queue
             """
-            query_inprogress_obj = FilterInProgressDocuments(upload_path, self.in_progress_queue)
-            query_inprogress_thread = threading.Thread(target=query_inprogress_obj.query_in_progress_status)
+            query_inprogress_obj = FilterInProgressDocuments(upload_path, self.scheduler_queue, self.active_tasks)
+            query_inprogress_thread = threading.Thread(target=query_inprogress_obj.start_intake)
+            lease_thread = threading.Thread(target=query_inprogress_obj.maintain_leases, daemon=True)
+
+            """Thread 2: Hand scheduled documents to the worker processes"""
+            dispatch_thread = threading.Thread(target=self.dispatch_documents, daemon=True)
         
-            """Thread 2: Process the documents"""
-            process_documents = ProcessDocuments(self.in_progress_queue, upload_path, workspace_path)
-            process_document_thread = threading.Thread(target=process_documents.process_docs)
+            """Worker processes: Process the documents"""
+            document_worker_pool = DocumentWorkerPool(self.in_progress_queue, upload_path, workspace_path, self.active_tasks)
 
-            """Start Thread"""
+            """Start Thread and worker processes"""
             query_inprogress_thread.start()
-            process_document_thread.start()
+            lease_thread.start()
+            dispatch_thread.start()
+            document_worker_pool.start()
 
-            """Wait for threads to finish"""
+            """Wait for thread to finish"""
             query_inprogress_thread.join()
-            process_document_thread.join()
         except Exception as error:
             self.logger.error(f"An error occurred during OCRR engine execution: {error}")
             sys.exit(1)
 
+    def dispatch_documents(self):
+        """Move documents from the fair scheduler to the workers, blocking while all workers are busy"""
+        while True:
+            document_info = self.scheduler_queue.get()
+            self.in_progress_queue.put(document_info)
+
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     try:
         """Read config.ini"""
         config = configparser.ConfigParser(allow_no_value=True)
@@ -1,9 +1,7 @@
 import re
-import pytesseract
+from helper.ocr_cache import ocr_cache
 import datetime
-import cv2
 import configparser
-from qreader import QReader
 from ocrr_log_mgmt.ocrr_log import OCRREngineLogging
 from helper.pancard_text_coordinates import TextCoordinates
 from helper.pancard_signature_text_coordinates import SignatureTextCoordinates
@@ -33,13 +31,10 @@ class PancardDocumentInfo:
 
         """Get the text from document"""
         tesseract_config = r'--oem 3 --psm 11'
-        self.text_data = pytesseract.image_to_string(document_path, lang="eng", config=tesseract_config)
+        self.text_data = ocr_cache.image_to_string(document_path, lang="eng", config=tesseract_config)
 
         """Get the text for signature identification"""
         #self.signature_text_data = pytesseract.image_to_string(document_path)
-
-        """Create a QReader instance"""
-        self.qreader = QReader()
     
     """func: extract pancard number"""
     def extract_pancard_number(self) -> dict:
@@ -205,11 +200,8 @@ class PancardDocumentInfo:
         try:
             qrcode_coordinates = []
 
-            # Load the image
-            image = cv2.imread(self.document_path)
-
-            # Detect and decode QR codes
-            found_qrs = self.qreader.detect(image)
+            # Detect QR codes, cached by image content
+            found_qrs = ocr_cache.detect_qr_codes(self.document_path)
 
             if not found_qrs:
                 return result
@@ -1,5 +1,5 @@
 import re
-import pytesseract
+from helper.ocr_cache import ocr_cache
 import configparser
 from config.indian_places import indian_states_cities
 from ocrr_log_mgmt.ocrr_log import OCRREngineLogging
@@ -21,7 +21,7 @@ class PassportDocumentInfo:
 
         """Get the text from document"""
         tesseract_config = r'--oem 3 --psm 11'
-        self.text_data = pytesseract.image_to_string(document_path, lang="eng", config=tesseract_config)
+        self.text_data = ocr_cache.image_to_string(document_path, lang="eng", config=tesseract_config)
         
         """List of states"""
         self.states = indian_states_cities
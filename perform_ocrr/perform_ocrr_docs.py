@@ -10,129 +10,143 @@ from e_pancard.document_info import EPancardDocumentInfo
 from write_xml_data.xmldata import WriteXMLData
 from write_xml_data.rejected_xmldata import RejectedWriteXML
 from rejected_doc_redacted.redact_rejected_document import RedactRejectedDocument
+from document_normalization.normalize_document import ScaleTransform
 from pathlib import Path
 import requests
 import json
 import sys
 
 class PerformOCRROnDocument:
-    def __init__(self, document_info: dict) -> None:
+    def __init__(self, document_info: dict, checkpoint: object, db_client: object = None) -> None:
         self.document_info = document_info
+        self.checkpoint = checkpoint
        
         """Establish MongoDB Connection"""
         try:
-            self.db_client = MongoDBConnection().get_connection()
+            self.db_client = db_client if db_client is not None else MongoDBConnection().get_connection()
         except Exception as e:
             print(f"Error Connecting Mongodb : {e}")
             sys.exit(1)
+
+        """Documents methods, by document type (identification precedence is DocumentTypeIdentification.DOCUMENT_TYPES)"""
+        self.processing_document_methods = {
+            "CDSL": self.process_cdsl,
+            "E-PAN": self.process_e_pancard,
+            "PAN": self.process_pancard,
+            "E-Aadhaar": self.process_e_aadhaarcard,
+            "Aadhaar": self.process_aadhaarcard,
+            "Bharat Passport": self.process_passport,
+            "Bharat DL": self.process_dl
+        }
     
     def ocrr_docs(self):
+        """Run every stage of the document in sequence"""
         try:
-            """Identify Document"""
-            document_identification_obj = DocumentTypeIdentification(self.document_info['documentPath'])
-
-            """List of documents methods"""
-            processing_document_methods = [
-                (document_identification_obj.identify_document("CDSL"), self.process_cdsl),
-                (document_identification_obj.identify_document("E-PAN"), self.process_e_pancard),
-                (document_identification_obj.identify_document("PAN"), self.process_pancard),
-                (document_identification_obj.identify_document("E-Aadhaar"), self.process_e_aadhaarcard),
-                (document_identification_obj.identify_document("Aadhaar"), self.process_aadhaarcard),
-                (document_identification_obj.identify_document("Bharat Passport"), self.process_passport),
-                (document_identification_obj.identify_document("Bharat DL"), self.process_dl)
-            ]
-        
-            identified = False
+            document_type = self.classify()
+            result = self.extract(document_type)
+            self.emit(result)
+            return self.notify(result)
+        except Exception as e:
+            print(f"Error during OCR processing: {e}")
+            sys.exit(1)
 
-            for identify_method, process_method in processing_document_methods:
-                if identify_method:
-                    process_method(self.document_info['documentPath'], self.document_info['redactedPath'],
-                                self.document_info['documentName'], self.document_info['taskId'])
-                    identified = True
-                    break
+    """Stage: classify"""
+    def classify(self):
+        """A previous run already cached the OCR result"""
+        if self.checkpoint.done("ocrCached"):
+            return None
 
-            """Document is un-identified"""
-            if not identified:
-                self.unidentified_document_rejected(self.document_info['documentPath'], self.document_info['redactedPath'],
-                                                self.document_info['documentName'], self.document_info['taskId'])
+        """Identify Document: first matched type in precedence order, None when un-identified"""
+        return DocumentTypeIdentification(self.document_info['documentPath']).document_type()
 
-            """Remove collection data from ocrr workspace DB"""
-            self.remove_collection_data_from_ocrrworkspace(self.document_info['taskId'])
+    """Stage: extract"""
+    def extract(self, document_type):
+        if self.checkpoint.done("ocrCached"):
+            return self.checkpoint.get("ocrCached")
 
-            """Send Post request to webhook"""
-            #self.webhook_post_request(self.document_info['taskId'])
-        except Exception as e:
-            print(f"Error during OCR processing: {e}")
-            sys.exit(1)
+        if document_type in self.processing_document_methods:
+            return self.processing_document_methods[document_type](self.document_info['documentPath'])
+        return self.unidentified_document_rejected()
+
+    """Stage: emit"""
+    def emit(self, result):
+        """Cache the OCR result before writing, a crash after this point does not repeat OCR"""
+        if not self.checkpoint.done("ocrCached"):
+            self.checkpoint.save("ocrCached", result)
+
+        """Write the XML files"""
+        if not self.checkpoint.done("xmlWritten"):
+            self.perform_ocrr_on_docs(result, self.document_info['documentPath'], self.document_info['redactedPath'], self.document_info['documentName'])
+            self.checkpoint.save("xmlWritten")
+
+    """Stage: notify"""
+    def notify(self, result):
+        taskid = self.document_info['taskId']
+
+        """Update upload db"""
+        self.update_upload_filedetails(taskid, result['status'], result['message'])
+
+        """Remove document from workspace"""
+        self.remove_document_from_workspace(self.document_info['documentPath'])
+
+        """Remove collection data from ocrr workspace DB"""
+        self.remove_collection_data_from_ocrrworkspace(taskid)
+
+        """Send Post request to webhook"""
+        #self.webhook_post_request(taskid)
+
+        return result['status']
 
     """Perform OCRR on Documents"""
-    def perform_ocrr_on_docs(self, status, result, document_path, redactedPath, documentName, taskid):
+    def perform_ocrr_on_docs(self, result, document_path, redactedPath, documentName):
+        """Coordinates are found on the normalized workspace copy, map them back to the uploaded document"""
+        scale_transform = ScaleTransform(self.checkpoint.get("normalized")['scale'] if self.checkpoint.done("normalized") else 1.0)
 
-        if status == "REJECTED":
+        if result['status'] == "REJECTED":
             """Redact 75% and get the coordinates"""
-            rejected_doc_coordinates = RedactRejectedDocument(document_path).rejected()
+            rejected_doc_coordinates = scale_transform.coordinates_to_original(RedactRejectedDocument(document_path).rejected())
             RejectedWriteXML(redactedPath, documentName, rejected_doc_coordinates).writexml()
-            """Update upload db"""
-            self.update_upload_filedetails(taskid, "REJECTED", result['message'])
         else:
             """Write Redacted Document XML file"""
-            redacted_doc_coordinates = result['data']
+            redacted_doc_coordinates = scale_transform.result_to_original(result['data'])
             WriteXMLData(redactedPath, documentName, redacted_doc_coordinates ).writexmldata()
             WriteXMLData(redactedPath, documentName, redacted_doc_coordinates ).write_redacted_data_xml()
-            """Update upload db"""
-            self.update_upload_filedetails(taskid, "REDACTED", result['message'])
-        
-        """Remove document from workspace"""
-        self.remove_document_from_workspace(document_path)
 
     """Process: Pancard Document"""
-    def process_pancard(self, document_path, redactedPath, documentName, taskid):
-        result = PancardDocumentInfo(document_path).collect_pancard_info()
-        status = result['status']
-        self.perform_ocrr_on_docs(status, result, document_path, redactedPath, documentName, taskid)
+    def process_pancard(self, document_path):
+        return PancardDocumentInfo(document_path).collect_pancard_info()
 
     """Process: E-Pancard Document"""
-    def process_e_pancard(self, document_path, redactedPath, documentName, taskid):
-        result = EPancardDocumentInfo(document_path).collect_e_pancard_info()
-        status = result['status']
-        self.perform_ocrr_on_docs(status, result, document_path, redactedPath, documentName, taskid)
+    def process_e_pancard(self, document_path):
+        return EPancardDocumentInfo(document_path).collect_e_pancard_info()
 
     """Process: E-aadhaarcard Document """
-    def process_e_aadhaarcard(self, document_path, redactedPath, documentName, taskid ):
-        result = EaadhaarCardInfo(document_path).collect_eaadhaarcard_info()
-        status = result['status']
-        self.perform_ocrr_on_docs(status, result, document_path, redactedPath, documentName, taskid)
+    def process_e_aadhaarcard(self, document_path):
+        return EaadhaarCardInfo(document_path).collect_eaadhaarcard_info()
         
     """Process: Aadhaarcard Document"""
-    def process_aadhaarcard(self, document_path, redactedPath, documentName, taskid):
-        result = AaadhaarCardInfo(document_path).collect_aadhaarcard_info()
-        status = result['status']
-        self.perform_ocrr_on_docs(status, result, document_path, redactedPath, documentName, taskid)
+    def process_aadhaarcard(self, document_path):
+        return AaadhaarCardInfo(document_path).collect_aadhaarcard_info()
 
     """Process: Passport Document"""
-    def process_passport(self, document_path, redactedPath, documentName, taskid ):
-        result = PassportDocumentInfo(document_path).collect_passport_info()
-        status = result['status']
-        self.perform_ocrr_on_docs(status, result, document_path, redactedPath, documentName, taskid)
+    def process_passport(self, document_path):
+        return PassportDocumentInfo(document_path).collect_passport_info()
         
     """Process: Driving License Document"""
-    def process_dl(self, document_path, redactedPath, documentName, taskid ):
-        result = DrivingLicenseDocumentInfo(document_path).collect_dl_info()
-        status = result['status']
-        self.perform_ocrr_on_docs(status, result, document_path, redactedPath, documentName, taskid)
+    def process_dl(self, document_path):
+        return DrivingLicenseDocumentInfo(document_path).collect_dl_info()
         
     """Process: CDSL Document"""
-    def process_cdsl(self, document_path, redactedPath, documentName, taskid):
-        result = CDSLInfo(document_path).collect_cdsl_info()
-        status = result['status']
-        self.perform_ocrr_on_docs(status, result, document_path, redactedPath, documentName, taskid)
+    def process_cdsl(self, document_path):
+        return CDSLInfo(document_path).collect_cdsl_info()
 
     def remove_collection_data_from_ocrrworkspace(self, taskid):
         database_name = "ocrrworkspace"
         collection_name = "ocrr"
         database = self.db_client[database_name]
         collection = database[collection_name]
-        remove_query = {"taskId": taskid}
+        """Only the lease owner removes the task"""
+        remove_query = {"taskId": taskid, "leaseOwner": self.document_info['leaseOwner']}
         collection.delete_one(remove_query)
     
     def update_upload_filedetails(self, taskid, status, message):
@@ -148,17 +162,13 @@ class PerformOCRROnDocument:
         collection.update_one(filter_query, update)
     
     def remove_document_from_workspace(self, document_path):
+        """Already removed when a resumed task had finished this step"""
         path = Path(document_path)
-        path.unlink()
+        path.unlink(missing_ok=True)
     
-    def unidentified_document_rejected(self, document_path, redactedPath, documentName, taskid):
-        """Redact 75% and get the coordinates"""
-        rejected_doc_coordinates = RedactRejectedDocument(document_path).rejected()
-        RejectedWriteXML(redactedPath, documentName, rejected_doc_coordinates).writexml()
-        """Update upload db"""
-        self.update_upload_filedetails(taskid, "REJECTED", "Unidentified Document")
-        """Remove document from workspace"""
-        self.remove_document_from_workspace(document_path)
+    def unidentified_document_rejected(self):
+        """Redact 75% of an un-identified document"""
+        return {"message": "Unidentified Document", "status": "REJECTED"}
     
     def webhook_post_request(self, taskid):
         database_name = "upload"
@@ -0,0 +1,60 @@
+import threading
+from time import perf_counter
+
+class PipelineStage:
+    """
+        One step of the document pipeline
+        - With an executor, work is submitted to it (I/O stages run on their own threads)
+        - Without one, work runs inline on the worker's CPU thread
+        Tracks queue depth, in-service count and service time
+    """
+    def __init__(self, name: str, executor: object = None) -> None:
+        self.name = name
+        self.executor = executor
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.active = 0
+        self.completed = 0
+        self.service_seconds = 0.0
+
+    def submit(self, fn, *args):
+        self.hand_over()
+        return self.executor.submit(self.run_queued, fn, *args)
+
+    def run_queued(self, fn, *args):
+        self.take()
+        return self.run(fn, *args)
+
+    def hand_over(self):
+        """A document is waiting for this stage"""
+        with self.lock:
+            self.waiting += 1
+
+    def take(self):
+        with self.lock:
+            self.waiting -= 1
+
+    def run(self, fn, *args):
+        with self.lock:
+            self.active += 1
+        start = perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.completed += 1
+                self.service_seconds += perf_counter() - start
+
+    def snapshot(self) -> dict:
+        """Current queue depth and mean service time since the previous snapshot"""
+        with self.lock:
+            snapshot = {
+                "queueDepth": self.waiting,
+                "active": self.active,
+                "completed": self.completed,
+                "avgServiceMs": round(1000 * self.service_seconds / self.completed, 1) if self.completed else 0.0
+            }
+            self.completed = 0
+            self.service_seconds = 0.0
+            return snapshot
@@ -1,13 +1,29 @@
 import os
 import sys
 import cv2
+import queue
 import shutil
-from time import sleep
+import configparser
+from collections import deque
+from functools import partial
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from config.database import MongoDBConnection
+from task_lease.task_lease import TaskLease
+from task_checkpoint.task_checkpoint import TaskCheckpoint
 from perform_ocrr.perform_ocrr_docs import PerformOCRROnDocument
+from process_documents.worker_metrics import WorkerUtilization
+from process_documents.pipeline_stage import PipelineStage
+from helper.ocr_cache import ocr_cache
+from helper.document_context import document_contexts
+from helper.qr_detector import qr_detector
+from document_normalization.normalize_document import DocumentNormalization
+from document_normalization.denoise_document import DocumentDenoise
+from helper.ocr_disk_cache import OCRDiskCache
 from ocrr_log_mgmt.ocrr_log import OCRREngineLogging
 
 class ProcessDocuments:
-    def __init__(self, inprogress_queue: object, upload_path: str, workspace_path: str) -> None:
+    def __init__(self, inprogress_queue: object, upload_path: str, workspace_path: str, result_queue: object = None, worker_id: int = 0) -> None:
         """Logger"""
         logger_config = OCRREngineLogging()
         self.logger = logger_config.configure_logger()
@@ -15,47 +31,250 @@ class ProcessDocuments:
         self.inprogress_queue = inprogress_queue
         self.upload_path = upload_path
         self.workspace_path = workspace_path
+        self.result_queue = result_queue
+        self.worker_id = worker_id
+
+        """Read config.ini"""
+        config = configparser.ConfigParser(allow_no_value=True)
+        config.read(r'C:\Program Files (x86)\OCRR\config\config.ini')
+        self.queue_timeout = config.getfloat('Engine', 'QueueTimeout', fallback=1.0)
+        self.max_idle_backoff = config.getfloat('Engine', 'MaxIdleBackoff', fallback=5.0)
+        self.worker_utilization = WorkerUtilization(config.getint('Engine', 'MetricsInterval', fallback=60))
+        self.prefetch = config.getint('Pipeline', 'Prefetch', fallback=1)
+        io_threads = config.getint('Pipeline', 'IOThreads', fallback=2)
+
+        """Concurrent OCR passes per document: by default the cores left per worker, so the pool is not oversubscribed"""
+        ocr_threads = config.getint('OCR', 'Threads', fallback=0)
+        if ocr_threads <= 0:
+            workers = config.getint('Engine', 'Workers', fallback=os.cpu_count())
+            ocr_threads = max((os.cpu_count() or 1) // max(workers, 1), 1)
+        ocr_cache.set_thread_budget(ocr_threads)
+
+        """Size normalization before OCR"""
+        self.normalize = config.getboolean('Normalize', 'Enabled', fallback=True)
+        self.min_long_side = config.getint('Normalize', 'MinLongSide', fallback=1000)
+        self.max_long_side = config.getint('Normalize', 'MaxLongSide', fallback=2400)
+
+        """Denoise tier by estimated noise level, documents and time per tier"""
+        self.document_denoise = DocumentDenoise(config.getfloat('Preprocess', 'LightNoiseSigma', fallback=3.0),
+                                                config.getfloat('Preprocess', 'HeavyNoiseSigma', fallback=8.0))
+        self.denoise_stats = {tier: {"documents": 0, "seconds": 0.0} for tier in DocumentDenoise.TIERS}
+
+        """Persistent OCR/QR results by image content, shared by the workers of this node"""
+        self.ocr_disk_cache = None
+        if config.getboolean('OCRCache', 'Persistent', fallback=True):
+            self.ocr_disk_cache = OCRDiskCache(workspace_path, config.getint('OCRCache', 'MaxSizeMB', fallback=512) * 1024 * 1024)
+            ocr_cache.attach_disk_cache(self.ocr_disk_cache)
+
+        """Task leases, to make sure no other node took over a task before working on it"""
+        try:
+            self.db_client = MongoDBConnection().get_connection()
+            self.task_lease = TaskLease(self.db_client["ocrrworkspace"]["ocrr"])
+        except Exception as e:
+            self.logger.error(f"Error Connecting Mongodb : {e}")
+            sys.exit(1)
+
+        """
+            Pipeline stages
+            - ingest, emit, notify: filesystem and MongoDB I/O, each on its own thread pool
+            - preprocess, classify, extract: CPU bound, inline on this worker process
+        """
+        self.stages = {
+            "ingest": PipelineStage("ingest", ThreadPoolExecutor(io_threads, thread_name_prefix="ingest")),
+            "preprocess": PipelineStage("preprocess"),
+            "classify": PipelineStage("classify"),
+            "extract": PipelineStage("extract"),
+            "emit": PipelineStage("emit", ThreadPoolExecutor(io_threads, thread_name_prefix="emit")),
+            "notify": PipelineStage("notify", ThreadPoolExecutor(io_threads, thread_name_prefix="notify"))
+        }
     
     def process_docs(self):
+        queue_timeout = self.queue_timeout
+        ingesting = deque()
         while True:
             try:
-                document_info = self.inprogress_queue.get()
-                if document_info is not None:
-                    """Pre-Processing docuement"""
-                    self.logger.info(f"| Pre-Processing document {document_info['path']}")
-                    document_name_prefix = self.get_prefix_name(document_info['path'])
-                    document_name = os.path.basename(document_info['path'])
-                    renamed_doc_name = f"{document_name_prefix}{document_name}"
-                    jpeg_path = os.path.join(self.workspace_path, renamed_doc_name)
-
-                
-                    """Copy document to workspace"""
-                    shutil.copy(document_info['path'], jpeg_path)
-
-                    """Check if document is grayscaled"""
-                    if not self.check_grayscale_document(jpeg_path):
-                        """Perform Pre-Processing"""
-                        self.pre_process_docs(jpeg_path, renamed_doc_name)
-
-                    """Perform OCR-Redaction and Prepare XML file"""
-                    document_info_dict = {
-                            "taskId": document_info['taskId'],
-                            "roomName": document_name_prefix.split('+')[0],
-                            "roomID": document_name_prefix.split('+')[1],
-                            "documentName": document_name,
-                            "documentPath": jpeg_path,
-                            "uploadPath": self.upload_path,
-                            "rejectedPath": self.upload_path+"\\"+document_name_prefix.split('+')[0]+"\\"+document_name_prefix.split('+')[1]+"\\"+"Rejected",
-                            "redactedPath": self.upload_path+"\\"+document_name_prefix.split('+')[0]+"\\"+document_name_prefix.split('+')[1]+"\\"+"Redacted"
-                        }
-                    PerformOCRROnDocument(document_info_dict).ocrr_docs()
-                sleep(5)
+                """
+                    Keep the ingest stage up to `Prefetch` documents ahead of the CPU stages
+                    Block on the queue only when there is nothing else to do, so a waiting document is picked up immediately
+                    Back off (wait longer per wake-up) only while the queue stays empty
+                """
+                while len(ingesting) <= self.prefetch:
+                    block = not ingesting
+                    idle_start = perf_counter()
+                    try:
+                        document_info = self.inprogress_queue.get(block=block, timeout=queue_timeout if block else None)
+                    except queue.Empty:
+                        if block:
+                            queue_timeout = min(queue_timeout * 2, self.max_idle_backoff)
+                            self.worker_utilization.add_idle(perf_counter() - idle_start)
+                        break
+                    queue_timeout = self.queue_timeout
+                    self.worker_utilization.add_idle(perf_counter() - idle_start)
+
+                    if document_info is not None:
+                        """The worker pool tracks the task from now on, it releases the lease if this worker dies"""
+                        self.report_result("STARTED", document_info['taskId'])
+                        ingest_future = self.stages['ingest'].submit(self.ingest_document, document_info)
+                        ingesting.append((document_info['taskId'], ingest_future))
+
+                if not ingesting:
+                    self.report_utilization()
+                    continue
+
+                """Wait for the oldest ingest"""
+                idle_start = perf_counter()
+                taskid, ingest_future = ingesting.popleft()
+                ingest_error = ingest_future.exception()
+                self.stages['preprocess'].take()
+                self.worker_utilization.add_idle(perf_counter() - idle_start)
+                if ingest_error is not None:
+                    self.task_failed(taskid, "ingest", ingest_error)
+                    continue
+                document = ingest_future.result()
+                if document is None:
+                    continue
+
+                """CPU stages, a document that fails in one is given back without stopping the worker"""
+                busy_start = perf_counter()
+                ocrr = document['ocrr']
+                stage = "preprocess"
+                try:
+                    self.stages['preprocess'].run(self.preprocess_document, document)
+                    stage = "classify"
+                    document_type = self.stages['classify'].run(ocrr.classify)
+                    stage = "extract"
+                    result = self.stages['extract'].run(ocrr.extract, document_type)
+                except Exception as e:
+                    self.worker_utilization.add_busy(perf_counter() - busy_start)
+                    ocr_cache.finish_document()
+                    self.release_document_context(taskid, ocrr)
+                    self.task_failed(taskid, stage, e)
+                    continue
+                self.worker_utilization.add_busy(perf_counter() - busy_start)
+                ocr_stats = ocr_cache.finish_document()
+                self.logger.info(f"| Task {taskid}: {ocr_stats['tesseractCalls']} tesseract calls, "
+                                 f"{ocr_stats['tesseractCallsSaved']} saved by the OCR cache")
+                """OCR is done, only the image size is needed from here on"""
+                document_contexts.context(document['jpegPath']).unload()
+
+                """Hand the result to the I/O stages: emit XML, then notify MongoDB"""
+                emit_future = self.stages['emit'].submit(ocrr.emit, result)
+                emit_future.add_done_callback(partial(self.emit_done, taskid, ocrr, result))
+                self.report_utilization()
             except Exception as e:
                 self.logger.error(f"Error processing document: {str(e)}")
                 sys.exit(1)
-                
 
-    
+    """Stage: ingest"""
+    def ingest_document(self, document_info: dict):
+        try:
+            return self.ingest_workspace_copy(document_info)
+        finally:
+            """The document now waits for the CPU stages"""
+            self.stages['preprocess'].hand_over()
+
+    def ingest_workspace_copy(self, document_info: dict):
+        if not self.task_lease.confirm(document_info['taskId']):
+            self.logger.info(f"| Lease for task {document_info['taskId']} is held by another node, skipping")
+            self.report_result("FINISHED", document_info['taskId'], "SKIPPED")
+            return None
+
+        self.logger.info(f"| Ingesting document {document_info['path']}")
+        document_name_prefix = self.get_prefix_name(document_info['path'])
+        document_name = os.path.basename(document_info['path'])
+        renamed_doc_name = f"{document_name_prefix}{document_name}"
+        jpeg_path = os.path.join(self.workspace_path, renamed_doc_name)
+
+        """Resume after the last stage a previous run completed"""
+        checkpoint = TaskCheckpoint(self.task_lease.collection_ocrr, document_info['taskId'],
+                                    self.task_lease.owner_id, document_info.get('checkpoint'))
+        if checkpoint.completed_stages():
+            self.logger.info(f"| Resuming task {document_info['taskId']} after stages {checkpoint.completed_stages()}")
+
+        """
+            Copy document to workspace, the workspace copy is needed until the XML files are written
+            A copy that is not checkpointed as normalized may have been resized by a run that stopped before the checkpoint,
+            it is copied again from the upload so it is never normalized twice
+        """
+        copied = False
+        workspace_copy_usable = checkpoint.done("copied") and os.path.exists(jpeg_path) and (not self.normalize or checkpoint.done("normalized"))
+        if not checkpoint.done("xmlWritten") and not workspace_copy_usable:
+            shutil.copy(document_info['path'], jpeg_path)
+            checkpoint.save("copied", jpeg_path)
+            copied = True
+
+        document_info_dict = {
+                "taskId": document_info['taskId'],
+                "leaseOwner": self.task_lease.owner_id,
+                "roomName": document_name_prefix.split('+')[0],
+                "roomID": document_name_prefix.split('+')[1],
+                "documentName": document_name,
+                "documentPath": jpeg_path,
+                "uploadPath": self.upload_path,
+                "rejectedPath": self.upload_path+"\\"+document_name_prefix.split('+')[0]+"\\"+document_name_prefix.split('+')[1]+"\\"+"Rejected",
+                "redactedPath": self.upload_path+"\\"+document_name_prefix.split('+')[0]+"\\"+document_name_prefix.split('+')[1]+"\\"+"Redacted"
+            }
+        return {
+            "checkpoint": checkpoint,
+            "copied": copied,
+            "jpegPath": jpeg_path,
+            "renamedDocName": renamed_doc_name,
+            "ocrr": PerformOCRROnDocument(document_info_dict, checkpoint, self.db_client)
+        }
+
+    """Stage: preprocess"""
+    def preprocess_document(self, document: dict):
+        """Pre-processing is only needed for OCR, redo it whenever the copy was refreshed"""
+        checkpoint = document['checkpoint']
+        """
+            Resize a fresh copy to the OCR size range, the scale maps the coordinates back before the XML files are written
+            Also done after OCR was cached: the rejected-document coordinates are taken from the workspace copy
+        """
+        if self.normalize and (document['copied'] or not checkpoint.done("normalized")):
+            scale = DocumentNormalization(document['jpegPath'], self.min_long_side, self.max_long_side).normalize()
+            checkpoint.save("normalized", {"scale": scale})
+        if checkpoint.done("ocrCached") or (checkpoint.done("preprocessed") and not document['copied']):
+            return
+        """Check if document is grayscaled"""
+        preprocessing = None
+        if not self.check_grayscale_document(document['jpegPath']):
+            """Perform Pre-Processing"""
+            preprocessing = self.pre_process_docs(document['jpegPath'], document['renamedDocName'])
+            self.denoise_stats[preprocessing['denoise']]['documents'] += 1
+            self.denoise_stats[preprocessing['denoise']]['seconds'] += preprocessing['denoiseSeconds']
+            self.logger.info(f"| Document {document['renamedDocName']}: noise sigma {preprocessing['noiseSigma']}, "
+                             f"{preprocessing['denoise']} denoise in {preprocessing['denoiseSeconds']}s")
+        checkpoint.save("preprocessed", preprocessing)
+
+    def emit_done(self, taskid: str, ocrr: object, result: dict, emit_future: object):
+        if emit_future.exception() is not None:
+            self.release_document_context(taskid, ocrr)
+            self.task_failed(taskid, "emit", emit_future.exception())
+            return
+        notify_future = self.stages['notify'].submit(ocrr.notify, result)
+        notify_future.add_done_callback(partial(self.notify_done, taskid, ocrr))
+
+    def notify_done(self, taskid: str, ocrr: object, notify_future: object):
+        self.release_document_context(taskid, ocrr)
+        if notify_future.exception() is not None:
+            self.task_failed(taskid, "notify", notify_future.exception())
+            return
+        self.report_result("FINISHED", taskid, notify_future.result())
+
+    def release_document_context(self, taskid: str, ocrr: object):
+        """The decoded image is kept from preprocess to emit, log how often the document was decoded"""
+        decode_stats = document_contexts.release(ocrr.document_info['documentPath'])
+        self.logger.info(f"| Task {taskid}: image decoded {decode_stats['decodes']} times, "
+                         f"{decode_stats['fileDecodes']} more by the tesseract subprocess")
+
+    def task_failed(self, taskid: str, stage: str, error: BaseException):
+        """Give the task back, it is reclaimed and resumed from its last checkpoint until it failed MaxAttempts times"""
+        self.logger.error(f"| Task {taskid} failed in {stage} stage: {error}")
+        try:
+            self.task_lease.release(taskid)
+        finally:
+            self.report_result("FINISHED", taskid, "FAILED")
+
     def pre_process_docs(self, jpeg_path: str, renamed_doc_name: str):
         # Document processing cv2 values
         sigma_x = 1
@@ -64,22 +283,61 @@ class ProcessDocuments:
         sig_beta = -0.2
         gamma = 0
 
-        """Pre-process document"""
-        document = cv2.imread(jpeg_path)
-        denoise_document = cv2.fastNlMeansDenoisingColored(document, None,  10, 10, 7, 21)
+        """Pre-process document, denoised only as much as its estimated noise level calls for"""
+        document_context = document_contexts.context(jpeg_path)
+        document = document_context.bgr()
+        denoise_start = perf_counter()
+        noise_sigma = self.document_denoise.noise_sigma(document_context.gray())
+        denoise_tier = self.document_denoise.tier(noise_sigma)
+        denoise_document = self.document_denoise.denoise(document, denoise_tier)
+        denoise_seconds = perf_counter() - denoise_start
         gray_document = cv2.cvtColor(denoise_document, cv2.COLOR_BGR2GRAY)
         gaussian_blur_document = cv2.GaussianBlur(gray_document, (5,5), sigmaX=sigma_x, sigmaY=sigma_y )
         sharpened_image = cv2.addWeighted(gray_document, sig_alpha, gaussian_blur_document, sig_beta, gamma)
         sharpened_image_gray = cv2.cvtColor(sharpened_image, cv2.COLOR_GRAY2BGR)
         cv2.imwrite(os.path.join(jpeg_path, renamed_doc_name), sharpened_image_gray)
+        return {"noiseSigma": round(noise_sigma, 2), "denoise": denoise_tier, "denoiseSeconds": round(denoise_seconds, 3)}
     
     def check_grayscale_document(self, jpeg_path):
-        document = cv2.imread(jpeg_path)
-        if len(document.shape) < 3: return True
-        if document.shape[2]  == 1: return True
-        b,g,r = document[:,:,0], document[:,:,1], document[:,:,2]
-        if (b==g).all() and (b==r).all(): return True
-        return False
+        return document_contexts.context(jpeg_path).is_grayscale()
+
+    def report_result(self, event: str, taskid: str, status: str = None):
+        """Report document events to the worker pool"""
+        if self.result_queue is not None:
+            self.result_queue.put({"event": event, "workerId": self.worker_id, "taskId": taskid, "status": status})
+
+    def report_utilization(self):
+        """Log idle vs busy time and stage queues, and share them with the worker pool"""
+        if not self.worker_utilization.report_due():
+            return
+        utilization = self.worker_utilization.snapshot()
+        utilization['stages'] = {name: stage.snapshot() for name, stage in self.stages.items()}
+        utilization['ocr'] = ocr_cache.snapshot()
+        utilization['decodes'] = document_contexts.snapshot()
+        utilization['qr'] = qr_detector.snapshot()
+        utilization['denoise'] = {tier: {**stats, "seconds": round(stats['seconds'], 3)} for tier, stats in self.denoise_stats.items()}
+        self.denoise_stats = {tier: {"documents": 0, "seconds": 0.0} for tier in DocumentDenoise.TIERS}
+        if self.ocr_disk_cache is not None:
+            utilization['ocrDiskCache'] = self.ocr_disk_cache.snapshot()
+        self.logger.info(f"| Worker {self.worker_id} busy {utilization['busySeconds']}s, idle {utilization['idleSeconds']}s, "
+                         f"{utilization['documents']} documents, utilization {utilization['utilization']:.0%}, "
+                         f"tesseract calls {utilization['ocr']['tesseractCalls']} ({utilization['ocr']['tesseractCallsSaved']} saved), "
+                         f"image decodes {utilization['decodes']['decodes']} (+{utilization['decodes']['fileDecodes']} by tesseract)")
+        if 'ocrDiskCache' in utilization:
+            self.logger.info(f"| Worker {self.worker_id} OCR disk cache hits {utilization['ocrDiskCache']['hits']}, "
+                             f"misses {utilization['ocrDiskCache']['misses']}, evictions {utilization['ocrDiskCache']['evictions']}")
+        self.logger.info(f"| Worker {self.worker_id} denoise tiers: " + ", ".join(
+            f"{tier} {stats['documents']} ({stats['seconds']}s)" for tier, stats in utilization['denoise'].items()))
+        for tier, stats in utilization['qr'].items():
+            if stats['attempts']:
+                self.logger.info(f"| Worker {self.worker_id} QR {tier} tier: {stats['hits']}/{stats['attempts']} hits, "
+                                 f"avg {stats['seconds'] / stats['attempts'] * 1000:.0f} ms")
+        for name, stage in utilization['stages'].items():
+            self.logger.info(f"| Worker {self.worker_id} stage {name}: queue depth {stage['queueDepth']}, "
+                             f"active {stage['active']}, avg service {stage['avgServiceMs']} ms over {stage['completed']} documents")
+        if self.result_queue is not None:
+            self.result_queue.put({"event": "METRICS", "workerId": self.worker_id, "taskId": None, "status": None,
+                                   "metrics": utilization})
 
     def get_prefix_name(self, document_path: str) -> str:
         renamed_doc_list = document_path.split("\\")
@@ -0,0 +1,39 @@
+from time import perf_counter
+
+class WorkerUtilization:
+    def __init__(self, report_interval: int = 60) -> None:
+        self.report_interval = report_interval
+        self.idle_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.documents = 0
+        self.last_report = perf_counter()
+
+    def add_idle(self, seconds: float):
+        self.idle_seconds += seconds
+
+    def add_busy(self, seconds: float):
+        self.busy_seconds += seconds
+        self.documents += 1
+
+    def utilization(self) -> float:
+        total = self.idle_seconds + self.busy_seconds
+        if total == 0:
+            return 0.0
+        return self.busy_seconds / total
+
+    def report_due(self) -> bool:
+        return perf_counter() - self.last_report >= self.report_interval
+
+    def snapshot(self) -> dict:
+        """Idle/busy totals since the previous snapshot, then start a new interval"""
+        snapshot = {
+            "idleSeconds": round(self.idle_seconds, 3),
+            "busySeconds": round(self.busy_seconds, 3),
+            "documents": self.documents,
+            "utilization": round(self.utilization(), 3)
+        }
+        self.idle_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.documents = 0
+        self.last_report = perf_counter()
+        return snapshot
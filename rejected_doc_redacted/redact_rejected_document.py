@@ -1,5 +1,5 @@
 import numpy as np
-import cv2
+from helper.document_context import document_contexts
 
 class RedactRejectedDocument:
     def __init__(self, document_path) -> None:
@@ -7,10 +7,8 @@ class RedactRejectedDocument:
     
     """Get 75% document coordinates"""
     def rejected(self) -> list:
-        # Read the image
-        image = cv2.imread(self.document_path)
-        # Get the image height and width
-        height, width = image.shape[:2]
+        # Get the image height and width, from the image decoded for OCR
+        width, height = document_contexts.context(self.document_path).size()
         # Calculate the coordinates of the 75% of the image
         x1 = 0
         y1 = 0
@@ -0,0 +1,34 @@
+import datetime
+
+class TaskCheckpoint:
+    """
+        Per-task stage checkpoints stored on the task record in ocrrworkspace.ocrr
+        A restarted or reclaimed task resumes after its last completed stage
+    """
+    STAGES = ("copied", "normalized", "preprocessed", "ocrCached", "xmlWritten")
+
+    def __init__(self, collection_ocrr: object, taskid: str, lease_owner: str, checkpoint: dict = None) -> None:
+        self.collection_ocrr = collection_ocrr
+        self.taskid = taskid
+        self.lease_owner = lease_owner
+        self.checkpoint = dict(checkpoint or {})
+
+    def done(self, stage: str) -> bool:
+        return stage in self.checkpoint
+
+    def get(self, stage: str):
+        return self.checkpoint[stage]['data']
+
+    def completed_stages(self) -> list:
+        return [stage for stage in self.STAGES if stage in self.checkpoint]
+
+    def save(self, stage: str, data=None):
+        stage_checkpoint = {
+            "at": datetime.datetime.now(datetime.timezone.utc),
+            "data": data
+        }
+        self.collection_ocrr.update_one(
+            {"taskId": self.taskid, "leaseOwner": self.lease_owner},
+            {"$set": {f"checkpoint.{stage}": stage_checkpoint}}
+        )
+        self.checkpoint[stage] = stage_checkpoint
@@ -0,0 +1,23 @@
+import threading
+
+class ActiveTasks:
+    """
+        Tasks this node holds a lease for and still has to finish: in the scheduler queue, on the way to a worker or in flight
+        Added when the intake claims a task, removed when a worker reports it finished or the worker pool releases it
+        Only these leases are renewed on the heartbeat
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.taskids = set()
+
+    def add(self, taskid: str):
+        with self.lock:
+            self.taskids.add(taskid)
+
+    def discard(self, taskid: str):
+        with self.lock:
+            self.taskids.discard(taskid)
+
+    def snapshot(self) -> list:
+        with self.lock:
+            return list(self.taskids)
@@ -0,0 +1,153 @@
+import socket
+import datetime
+import configparser
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+
+class TaskLease:
+    """
+        Atomic task leases in ocrrworkspace.ocrr
+        A task belongs to the node in leaseOwner until leaseExpiresAt
+        Every node renews the leases of the tasks it still works on at each heartbeat; expired leases can be claimed by any node
+    """
+    def __init__(self, collection_ocrr: object) -> None:
+        self.collection_ocrr = collection_ocrr
+
+        """Read config.ini"""
+        config = configparser.ConfigParser(allow_no_value=True)
+        config.read(r'C:\Program Files (x86)\OCRR\config\config.ini')
+        self.owner_id = config.get('Lease', 'NodeId', fallback="") or socket.gethostname()
+        self.ttl = config.getint('Lease', 'TTL', fallback=60)
+        self.heartbeat_interval = config.getint('Lease', 'Heartbeat', fallback=20)
+        self.max_attempts = config.getint('Lease', 'MaxAttempts', fallback=3)
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc)
+
+    def expires_at(self) -> datetime.datetime:
+        return self.now() + datetime.timedelta(seconds=self.ttl)
+
+    def ensure_indexes(self):
+        self.collection_ocrr.create_index([("taskId", ASCENDING)], unique=True)
+        self.collection_ocrr.create_index([("leaseExpiresAt", ASCENDING)])
+        self.collection_ocrr.create_index([("leaseOwner", ASCENDING)])
+
+    def claim_new(self, document_info: dict) -> bool:
+        """Insert the task with a lease for this node, unless another node already has it"""
+        now = self.now()
+        lease = {
+            "leaseOwner": self.owner_id,
+            "leaseExpiresAt": self.expires_at(),
+            "heartbeatAt": now,
+            "attempts": 1
+        }
+        try:
+            result = self.collection_ocrr.update_one(
+                {"taskId": document_info['taskId']},
+                {"$setOnInsert": {**document_info, **lease}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        if result.upserted_id is None:
+            return False
+        document_info.update(lease)
+        return True
+
+    def claim_many(self, document_infos: list) -> list:
+        """
+            Batched claim_new: one unordered bulk upsert for the whole batch
+            Returns the documents this node claimed
+        """
+        if not document_infos:
+            return []
+        now = self.now()
+        lease = {
+            "leaseOwner": self.owner_id,
+            "leaseExpiresAt": self.expires_at(),
+            "heartbeatAt": now,
+            "attempts": 1
+        }
+        requests = [
+            UpdateOne({"taskId": document_info['taskId']}, {"$setOnInsert": {**document_info, **lease}}, upsert=True)
+            for document_info in document_infos
+        ]
+        try:
+            upserted_indexes = self.collection_ocrr.bulk_write(requests, ordered=False).upserted_ids.keys()
+        except BulkWriteError as error:
+            """Another node claimed some tasks concurrently (duplicate taskId), keep the rest"""
+            if any(write_error['code'] != 11000 for write_error in error.details['writeErrors']):
+                raise
+            upserted_indexes = [upserted['index'] for upserted in error.details['upserted']]
+
+        claimed = []
+        for index in sorted(upserted_indexes):
+            document_infos[index].update(lease)
+            claimed.append(document_infos[index])
+        return claimed
+
+    def reclaim_expired(self) -> dict:
+        """Take over one task whose lease expired (or that was never leased), counting one more attempt"""
+        now = self.now()
+        return self.collection_ocrr.find_one_and_update(
+            {
+                "$or": [
+                    {"leaseExpiresAt": {"$lt": now}},
+                    {"leaseExpiresAt": {"$exists": False}}
+                ]
+            },
+            {
+                "$set": {
+                    "leaseOwner": self.owner_id,
+                    "leaseExpiresAt": self.expires_at(),
+                    "heartbeatAt": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            projection={"_id": False},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def renew(self, taskids: list) -> int:
+        """Heartbeat: extend the leases of the tasks this node still has queued or in flight"""
+        if not taskids:
+            return 0
+        now = self.now()
+        result = self.collection_ocrr.update_many(
+            {"taskId": {"$in": taskids}, "leaseOwner": self.owner_id, "leaseExpiresAt": {"$gte": now}},
+            {"$set": {"leaseExpiresAt": self.expires_at(), "heartbeatAt": now}}
+        )
+        return result.modified_count
+
+    def confirm(self, taskid: str) -> bool:
+        """Check (and extend) that this node still holds the lease before doing the work"""
+        now = self.now()
+        task = self.collection_ocrr.find_one_and_update(
+            {"taskId": taskid, "leaseOwner": self.owner_id, "leaseExpiresAt": {"$gte": now}},
+            {"$set": {"leaseExpiresAt": self.expires_at(), "heartbeatAt": now}},
+            projection={"_id": True}
+        )
+        return task is not None
+
+    def release(self, taskid: str):
+        """Expire the lease now so the task is reclaimed on the next heartbeat"""
+        self.collection_ocrr.update_one(
+            {"taskId": taskid, "leaseOwner": self.owner_id},
+            {"$set": {"leaseExpiresAt": datetime.datetime.fromtimestamp(0, datetime.timezone.utc)}}
+        )
+
+    def release_owned(self) -> int:
+        """Expire every lease of this node, used at startup after an unclean shutdown"""
+        result = self.collection_ocrr.update_many(
+            {"leaseOwner": self.owner_id},
+            {"$set": {"leaseExpiresAt": datetime.datetime.fromtimestamp(0, datetime.timezone.utc)}}
+        )
+        return result.modified_count
+
+    def exhausted(self, document_info: dict) -> bool:
+        """The task was claimed MaxAttempts times already and failed every time"""
+        return document_info.get('attempts', 1) > self.max_attempts
+
+    def abandon(self, taskid: str):
+        """Remove a task this node gave up on, it is not reclaimed again"""
+        self.collection_ocrr.delete_one({"taskId": taskid, "leaseOwner": self.owner_id})
@@ -0,0 +1,107 @@
+import queue
+import threading
+from collections import OrderedDict, deque
+
+class ClientFairQueue:
+    """
+        Bounded task queue that round-robins across clientId
+        - Higher priority tasks are always served first
+        - Within a priority, each client gets `weight` consecutive tasks per turn
+        Raises queue.Full / queue.Empty like queue.Queue
+    """
+    def __init__(self, maxsize: int, client_weights: dict = None, default_weight: int = 1) -> None:
+        self.maxsize = maxsize
+        self.client_weights = client_weights or {}
+        self.default_weight = default_weight
+
+        """priority -> OrderedDict(clientId -> deque of tasks)"""
+        self.priorities = {}
+        """clientId -> tasks left in the client's current turn, per priority"""
+        self.turn_credits = {}
+        self.size = 0
+
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.not_full = threading.Condition(self.mutex)
+
+    def qsize(self) -> int:
+        with self.mutex:
+            return self.size
+
+    def full(self) -> bool:
+        with self.mutex:
+            return self.size >= self.maxsize
+
+    def free_capacity(self) -> int:
+        with self.mutex:
+            return max(self.maxsize - self.size, 0)
+
+    def wait_for_capacity(self, block: bool = True, timeout: float = None) -> bool:
+        """Wait until a put() would be admitted without blocking"""
+        with self.not_full:
+            if not block:
+                return self.size < self.maxsize
+            return self.not_full.wait_for(lambda: self.size < self.maxsize, timeout)
+
+    def put(self, task: dict, block: bool = True, timeout: float = None):
+        with self.not_full:
+            if not block:
+                if self.size >= self.maxsize:
+                    raise queue.Full
+            elif not self.not_full.wait_for(lambda: self.size < self.maxsize, timeout):
+                raise queue.Full
+
+            priority = int(task.get('priority', 0) or 0)
+            clients = self.priorities.setdefault(priority, OrderedDict())
+            clients.setdefault(task['clientId'], deque()).append(task)
+            self.size += 1
+            self.not_empty.notify()
+
+    def get(self, block: bool = True, timeout: float = None) -> dict:
+        with self.not_empty:
+            if not block:
+                if self.size == 0:
+                    raise queue.Empty
+            elif not self.not_empty.wait_for(lambda: self.size > 0, timeout):
+                raise queue.Empty
+
+            task = self.next_task()
+            self.size -= 1
+            self.not_full.notify()
+            return task
+
+    def next_task(self) -> dict:
+        """Take the next task of the client whose turn it is in the highest priority"""
+        priority = max(self.priorities)
+        clients = self.priorities[priority]
+        clientid, tasks = next(iter(clients.items()))
+
+        credit_key = (priority, clientid)
+        credits = self.turn_credits.get(credit_key, self.weight(clientid))
+        task = tasks.popleft()
+        credits -= 1
+
+        if not tasks:
+            """Client has nothing left at this priority"""
+            del clients[clientid]
+            self.turn_credits.pop(credit_key, None)
+            if not clients:
+                del self.priorities[priority]
+        elif credits <= 0:
+            """Turn is over, move the client to the back of the round"""
+            clients.move_to_end(clientid)
+            self.turn_credits.pop(credit_key, None)
+        else:
+            self.turn_credits[credit_key] = credits
+        return task
+
+    def weight(self, clientid: str) -> int:
+        return max(1, int(self.client_weights.get(clientid, self.default_weight)))
+
+    def depth_by_client(self) -> dict:
+        with self.mutex:
+            depth = {}
+            for clients in self.priorities.values():
+                for clientid, tasks in clients.items():
+                    depth[clientid] = depth.get(clientid, 0) + len(tasks)
+            return depth
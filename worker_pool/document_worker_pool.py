@@ -0,0 +1,196 @@
+import os
+import queue
+import threading
+import configparser
+import multiprocessing
+from time import sleep
+from config.database import MongoDBConnection
+from task_lease.task_lease import TaskLease
+from task_lease.active_tasks import ActiveTasks
+from worker_pool.qr_batch_service import QRBatchService
+from ocrr_log_mgmt.ocrr_log import OCRREngineLogging
+
+
+def run_document_worker(worker_id: int, inprogress_queue: object, result_queue: object, upload_path: str, workspace_path: str,
+                        qr_service_connection: object = None, qr_control_connection: object = None):
+    """
+        Worker process entry point
+        Import and warm up the OCR stack once, then keep processing documents from the queue
+    """
+    """One thread per tesseract run, documents fan out their OCR passes instead (set before tesseract is loaded)"""
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    from helper.ocr_engine import tesseract_engine
+    from helper.qr_detector import qr_detector
+    from process_documents.process_docs import ProcessDocuments
+    from worker_pool.qr_batch_service import QRBatchClient
+
+    """Fail fast if tesseract is not available in this worker, and load the tesseract engines once"""
+    tesseract_engine.warm_up()
+
+    """QReader detections go to the engine's QR batch service, a restarted service's pipe arrives on the control pipe"""
+    if qr_control_connection is not None:
+        qr_detector.attach_batch_client(QRBatchClient(qr_service_connection, worker_id, qr_control_connection))
+
+    process_documents = ProcessDocuments(inprogress_queue, upload_path, workspace_path,
+                                         result_queue=result_queue, worker_id=worker_id)
+    process_documents.process_docs()
+
+
+class DocumentWorkerPool:
+    def __init__(self, inprogress_queue: object, upload_path: str, workspace_path: str, active_tasks: object = None) -> None:
+        """Logger"""
+        logger_config = OCRREngineLogging()
+        self.logger = logger_config.configure_logger()
+
+        """Read config.ini"""
+        config = configparser.ConfigParser(allow_no_value=True)
+        config.read(r'C:\Program Files (x86)\OCRR\config\config.ini')
+        self.workers = config.getint('Engine', 'Workers', fallback=os.cpu_count() or 1)
+        self.supervise_interval = config.getint('Engine', 'SuperviseInterval', fallback=5)
+
+        self.inprogress_queue = inprogress_queue
+        self.upload_path = upload_path
+        self.workspace_path = workspace_path
+
+        """Workers report document events back to the engine"""
+        self.result_queue = multiprocessing.Queue()
+        self.processes = {}
+        self.worker_metrics = {}
+
+        """Tasks per worker, updated by the result collector and the supervisor"""
+        self.in_flight = {}
+        self.in_flight_lock = threading.Lock()
+        """Finished tasks no longer need their lease renewed"""
+        self.active_tasks = active_tasks if active_tasks is not None else ActiveTasks()
+
+        """One QReader model for the pool, batching the detections of all workers"""
+        self.qr_service = QRBatchService()
+        """Per worker, the pool's end of the control pipe that hands the worker a pipe to a restarted QR service"""
+        self.qr_controls = {}
+
+        """Leases of tasks lost with a crashed worker are released for reclaiming"""
+        db_client = MongoDBConnection().get_connection()
+        self.task_lease = TaskLease(db_client["ocrrworkspace"]["ocrr"])
+
+    def start(self):
+        self.logger.info(f"| Starting document worker pool with {self.workers} workers")
+        if self.qr_service.enabled:
+            self.qr_service.start()
+        for worker_id in range(self.workers):
+            self.start_worker(worker_id)
+
+        supervisor_thread = threading.Thread(target=self.supervise_workers, daemon=True)
+        result_thread = threading.Thread(target=self.collect_results, daemon=True)
+        supervisor_thread.start()
+        result_thread.start()
+
+    def start_worker(self, worker_id: int):
+        """New pipes to the QR batch service and for later ones, those of a previous process of this worker may be broken"""
+        qr_service_connection = self.qr_service.connect_worker(worker_id)
+        qr_control_connection = None
+        if self.qr_service.enabled:
+            if worker_id in self.qr_controls:
+                self.qr_controls[worker_id].close()
+            qr_control_connection, self.qr_controls[worker_id] = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=run_document_worker,
+            args=(worker_id, self.inprogress_queue, self.result_queue, self.upload_path, self.workspace_path,
+                  qr_service_connection, qr_control_connection),
+            name=f"ocrr-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        for connection in (qr_service_connection, qr_control_connection):
+            if connection is not None:
+                connection.close()
+        self.processes[worker_id] = process
+        self.logger.info(f"| Document worker {worker_id} started with pid {process.pid}")
+
+    def supervise_workers(self):
+        """Restart workers that exited"""
+        while True:
+            for worker_id, process in list(self.processes.items()):
+                if not process.is_alive():
+                    with self.in_flight_lock:
+                        lost_tasks = self.in_flight.pop(worker_id, set())
+                    self.logger.error(f"| Document worker {worker_id} (pid {process.pid}) exited with code {process.exitcode}")
+                    for lost_task in lost_tasks:
+                        self.logger.error(f"| Document worker {worker_id} was processing task {lost_task}, releasing its lease")
+                        self.active_tasks.discard(lost_task)
+                        self.task_lease.release(lost_task)
+                    self.start_worker(worker_id)
+            if self.qr_service.enabled and not self.qr_service.is_alive():
+                """Running workers lost their pipe to the service, send each of them a pipe to the new one"""
+                self.logger.error(f"| QR batch service exited with code {self.qr_service.process.exitcode}, starting a new one")
+                self.qr_service.start()
+                for worker_id, process in list(self.processes.items()):
+                    if process.is_alive():
+                        self.reconnect_worker(worker_id)
+            sleep(self.supervise_interval)
+
+    def reconnect_worker(self, worker_id: int):
+        """Hand a running worker a pipe to the current QR batch service, the worker takes it before its next QR detection"""
+        qr_service_connection = self.qr_service.connect_worker(worker_id)
+        if qr_service_connection is None:
+            return
+        try:
+            self.qr_controls[worker_id].send(qr_service_connection)
+        except OSError:
+            """The worker exited meanwhile, it is restarted with a pipe of its own"""
+            pass
+        finally:
+            qr_service_connection.close()
+
+    def collect_results(self):
+        """Track document events reported by the workers"""
+        while True:
+            try:
+                result = self.result_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            if result['event'] == "STARTED":
+                with self.in_flight_lock:
+                    self.in_flight.setdefault(result['workerId'], set()).add(result['taskId'])
+            elif result['event'] == "METRICS":
+                self.worker_metrics[result['workerId']] = result['metrics']
+                self.log_pool_utilization()
+            else:
+                with self.in_flight_lock:
+                    self.in_flight.get(result['workerId'], set()).discard(result['taskId'])
+                self.active_tasks.discard(result['taskId'])
+                self.logger.info(f"| Worker {result['workerId']} finished task {result['taskId']} with status {result['status']}")
+
+    def log_pool_utilization(self):
+        """Idle vs busy time across the latest interval of every worker"""
+        busy_seconds = sum(metrics['busySeconds'] for metrics in self.worker_metrics.values())
+        idle_seconds = sum(metrics['idleSeconds'] for metrics in self.worker_metrics.values())
+        total_seconds = busy_seconds + idle_seconds
+        if total_seconds == 0:
+            return
+        self.logger.info(f"| Worker pool busy {busy_seconds:.1f}s, idle {idle_seconds:.1f}s, utilization {busy_seconds / total_seconds:.0%}")
+
+        """Stage queue depth across the pool"""
+        stage_depths = {}
+        for metrics in self.worker_metrics.values():
+            for name, stage in metrics.get('stages', {}).items():
+                stage_depths[name] = stage_depths.get(name, 0) + stage['queueDepth']
+        if stage_depths:
+            self.logger.info("| Worker pool stage queue depth " + ", ".join(f"{name} {depth}" for name, depth in stage_depths.items()))
+
+        """Tesseract calls saved by the per-document OCR cache"""
+        tesseract_calls = sum(metrics.get('ocr', {}).get('tesseractCalls', 0) for metrics in self.worker_metrics.values())
+        tesseract_calls_saved = sum(metrics.get('ocr', {}).get('tesseractCallsSaved', 0) for metrics in self.worker_metrics.values())
+        self.logger.info(f"| Worker pool tesseract calls {tesseract_calls}, saved by the OCR cache {tesseract_calls_saved}")
+
+        """Image decodes per document, from the shared document contexts"""
+        decodes = sum(metrics.get('decodes', {}).get('decodes', 0) for metrics in self.worker_metrics.values())
+        file_decodes = sum(metrics.get('decodes', {}).get('fileDecodes', 0) for metrics in self.worker_metrics.values())
+        documents = sum(metrics.get('documents', 0) for metrics in self.worker_metrics.values())
+        qr_hits = {tier: sum(metrics.get('qr', {}).get(tier, {}).get('hits', 0) for metrics in self.worker_metrics.values()) for tier in ("finder", "service", "qreader")}
+        qr_attempts = sum(metrics.get('qr', {}).get('finder', {}).get('attempts', 0) for metrics in self.worker_metrics.values())
+        if qr_attempts:
+            self.logger.info(f"| Worker pool QR finder tier hit rate {qr_hits['finder'] / qr_attempts:.0%}, "
+                             f"{qr_hits['service']} more found by the QR batch service, {qr_hits['qreader']} by local QReader")
+        if documents:
+            self.logger.info(f"| Worker pool image decodes per document {decodes / documents:.1f}, "
+                             f"{file_decodes / documents:.1f} more by the tesseract subprocess")
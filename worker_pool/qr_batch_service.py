@@ -0,0 +1,237 @@
+import os
+import cv2
+import itertools
+import threading
+import configparser
+import multiprocessing
+from time import perf_counter
+from multiprocessing.connection import wait
+from ocrr_log_mgmt.ocrr_log import OCRREngineLogging
+
+
+def run_qr_batch_service(control_connection: object, max_batch: int, max_wait: float, metrics_interval: int):
+    """
+        QR service process entry point
+        Each worker has its own pipe to the service, handed over on control_connection when the worker starts
+        Collect the requests of all workers for up to max_wait seconds (or max_batch images) and answer them together
+    """
+    from qreader import QReader
+    logger = OCRREngineLogging().configure_logger()
+    batch_detector = BatchQRDetector(QReader())
+    logger.info(f"| QR batch service started with pid {os.getpid()}, batches of up to {max_batch} images within {max_wait * 1000:.0f} ms")
+
+    worker_connections = {}
+    batches = 0
+    images = 0
+    report_time = perf_counter()
+    while True:
+        """Wait for the first request, then gather more until the batch is full or max_wait has passed"""
+        requests = []
+        deadline = None
+        while len(requests) < max_batch:
+            timeout = None if deadline is None else max(deadline - perf_counter(), 0)
+            ready = wait([control_connection] + list(worker_connections.values()), timeout)
+            if not ready:
+                break
+            for connection in ready:
+                if connection is control_connection:
+                    try:
+                        worker_id, worker_connection = control_connection.recv()
+                    except (EOFError, OSError):
+                        """The worker pool is gone"""
+                        return
+                    """A restarted worker replaces the pipe of its predecessor"""
+                    if worker_id in worker_connections:
+                        worker_connections[worker_id].close()
+                    worker_connections[worker_id] = worker_connection
+                    continue
+                try:
+                    request_id, image = connection.recv()
+                except (EOFError, OSError):
+                    """The worker exited"""
+                    worker_connections = {worker_id: worker_connection for worker_id, worker_connection in worker_connections.items()
+                                          if worker_connection is not connection}
+                    connection.close()
+                    continue
+                requests.append((connection, request_id, image))
+            if requests and deadline is None:
+                deadline = perf_counter() + max_wait
+            if deadline is not None and perf_counter() >= deadline:
+                break
+        if not requests:
+            continue
+
+        results = batch_detector.detect_batch([image for connection, request_id, image in requests])
+        for (connection, request_id, image), found_qrs in zip(requests, results):
+            try:
+                connection.send((request_id, found_qrs))
+            except OSError:
+                """The worker exited or was replaced since its request"""
+                pass
+
+        batches += 1
+        images += len(requests)
+        if perf_counter() - report_time >= metrics_interval:
+            logger.info(f"| QR batch service: {images} images in {batches} batches, avg batch {images / batches:.1f}")
+            batches = 0
+            images = 0
+            report_time = perf_counter()
+
+
+class BatchQRDetector:
+    """
+        QReader detection of a batch of requests on the service's one model
+        Each image goes through QReader's public detect(), with its own input preparation and thresholds,
+        so the service finds what a worker's own QReader would. An image whose detection fails gets None
+    """
+    def __init__(self, qreader: object) -> None:
+        self.qreader = qreader
+
+    def detect_batch(self, images: list) -> list:
+        return [self.detect_one(image) for image in images]
+
+    def detect_one(self, image) -> list:
+        try:
+            return [
+                {"bbox_xyxy": [float(value) for value in found_qr['bbox_xyxy']], "confidence": float(found_qr['confidence'])}
+                for found_qr in self.qreader.detect(image)
+            ]
+        except Exception:
+            return None
+
+
+class QRBatchService:
+    """
+        The QR batch service process of the engine
+        Every worker talks to it over a pipe of its own, no lock is shared between the processes
+        (a process killed while blocked on a shared multiprocessing.Queue leaves the queue's lock held for good)
+        A restarted service gets a new control pipe, a restarted worker a new pipe to the service
+        After a service restart, running workers get their new pipe over the worker pool's control pipe to each worker
+    """
+    def __init__(self) -> None:
+        """Read config.ini"""
+        config = configparser.ConfigParser(allow_no_value=True)
+        config.read(r'C:\Program Files (x86)\OCRR\config\config.ini')
+        self.enabled = config.getboolean('QRService', 'Enabled', fallback=True)
+        self.max_batch = config.getint('QRService', 'MaxBatch', fallback=8)
+        self.max_wait = config.getfloat('QRService', 'MaxWaitMs', fallback=20) / 1000
+        self.metrics_interval = config.getint('Engine', 'MetricsInterval', fallback=60)
+
+        self.lock = threading.Lock()
+        self.process = None
+        self.control_connection = None
+
+    def start(self):
+        """
+            Start a new service process with a new control pipe
+            Workers connected to a previous process saw their pipe close, the worker pool sends them a pipe to the new one
+        """
+        with self.lock:
+            service_control_connection, self.control_connection = multiprocessing.Pipe(duplex=False)
+            self.process = multiprocessing.Process(
+                target=run_qr_batch_service,
+                args=(service_control_connection, self.max_batch, self.max_wait, self.metrics_interval),
+                name="ocrr-qr-service",
+                daemon=True
+            )
+            self.process.start()
+            service_control_connection.close()
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def connect_worker(self, worker_id: int) -> object:
+        """New pipe between a (re)started worker and the service, None when the service is disabled or not running"""
+        if not self.enabled:
+            return None
+        with self.lock:
+            if not self.is_alive():
+                return None
+            worker_connection, service_connection = multiprocessing.Pipe()
+            try:
+                self.control_connection.send((worker_id, service_connection))
+            except OSError:
+                worker_connection.close()
+                return None
+            finally:
+                service_connection.close()
+            return worker_connection
+
+
+class QRBatchClient:
+    """
+        Worker side of the QR batch service, over the worker's own pipe
+        Images are sent downscaled to at most MaxSide pixels (the detector works at a lower resolution anyway), boxes are scaled back
+        detect() returns None when the service did not answer within Timeout seconds, the caller then detects locally
+        When the service exits, or misses MaxTimeouts answers in a row, the client detaches and detects locally
+        until the worker pool sends a pipe to a new service on control_connection
+    """
+    def __init__(self, connection: object, worker_id: int, control_connection: object = None) -> None:
+        """Read config.ini"""
+        config = configparser.ConfigParser(allow_no_value=True)
+        config.read(r'C:\Program Files (x86)\OCRR\config\config.ini')
+        self.max_side = config.getint('QRService', 'MaxSide', fallback=1280)
+        self.timeout = config.getfloat('QRService', 'Timeout', fallback=3)
+        self.max_timeouts = config.getint('QRService', 'MaxTimeouts', fallback=3)
+
+        self.connection = connection
+        self.control_connection = control_connection
+        self.worker_id = worker_id
+        self.request_ids = itertools.count()
+        self.timeouts = 0
+
+    def available(self) -> bool:
+        """Take a pipe the worker pool sent since the last call, then whether there is a service to ask"""
+        try:
+            while self.control_connection is not None and self.control_connection.poll():
+                connection = self.control_connection.recv()
+                if self.connection is not None:
+                    self.connection.close()
+                self.connection = connection
+                self.timeouts = 0
+                OCRREngineLogging().configure_logger().info(f"| Worker {self.worker_id}: connected to the new QR batch service")
+        except (EOFError, OSError):
+            """The worker pool is gone"""
+            self.control_connection = None
+        return self.connection is not None
+
+    def detect(self, image) -> list:
+        if not self.available():
+            return None
+
+        height, width = image.shape[:2]
+        scale = min(self.max_side / max(height, width), 1.0)
+        if scale < 1.0:
+            image = cv2.resize(image, (max(int(width * scale), 1), max(int(height * scale), 1)), interpolation=cv2.INTER_AREA)
+
+        request_id = next(self.request_ids)
+        try:
+            self.connection.send((request_id, image))
+            deadline = perf_counter() + self.timeout
+            while True:
+                remaining = deadline - perf_counter()
+                if remaining <= 0 or not self.connection.poll(remaining):
+                    self.timeouts += 1
+                    if self.timeouts >= self.max_timeouts:
+                        self.detach(f"did not answer {self.timeouts} requests in a row")
+                    return None
+                response_id, found_qrs = self.connection.recv()
+                """Answers to requests that timed out earlier are dropped"""
+                if response_id == request_id:
+                    break
+        except (EOFError, OSError):
+            self.detach("closed the connection")
+            return None
+
+        self.timeouts = 0
+        if found_qrs is None:
+            return None
+        return [
+            {**found_qr, "bbox_xyxy": [value / scale for value in found_qr['bbox_xyxy']]}
+            for found_qr in found_qrs
+        ]
+
+    def detach(self, reason: str):
+        OCRREngineLogging().configure_logger().error(f"| Worker {self.worker_id}: QR batch service {reason}, detecting QR codes locally")
+        self.connection.close()
+        self.connection = None